@@ -21,8 +21,9 @@ source "$VENV_DIR/bin/activate"
 
 # Check if required modules are installed
 # Note: Package names vs import names differ for some packages
-REQUIRED_PACKAGES=("requests" "requests-unixsocket")
-IMPORT_NAMES=("requests" "requests_unixsocket")
+# (currently none - the VM manager only uses the Python standard library)
+REQUIRED_PACKAGES=()
+IMPORT_NAMES=()
 MISSING_MODULES=()
 
 for i in "${!IMPORT_NAMES[@]}"; do
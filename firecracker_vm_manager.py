@@ -1,20 +1,18 @@
 #!/usr/bin/env python3
 
-import argparse
+import functools
 import sys
 
-from lib.config_manager import ConfigManager
-from lib.filesystem_manager import FilesystemManager
-from lib.vm_discovery import VMDiscovery
-from lib.vm_lifecycle import VMLifecycle
-
 # Version information
 __version__ = "1.1.0"
+_VERSION_TEXT = f"Firecracker VM Manager {__version__}"
 
+# Printed instead of the full help when the parameters of an action are invalid
+_USAGE_TEXT = "Usage: firecracker_vm_manager.py ACTION --name VM_NAME [OPTIONS]\nRun with --help for details.\n"
 
-def show_help_and_exit():
-    """Show help message with examples and exit"""
-    help_text = f"""
+
+# Help message with examples; the text never changes, so it is built once at import
+_HELP_TEXT = f"""
 Firecracker VM Manager v{__version__} - Create and destroy Firecracker VMs
 
 USAGE:
@@ -37,6 +35,9 @@ OPTIONAL PARAMETERS:
     --socket        Path to Firecracker API socket file (default: /var/run/firecracker/<vm_name>.sock)
     --config        Path to configuration file (default: /etc/firecracker.env)
 
+OPTIONAL FOR LIST ACTION:
+    --format        Output format: table (default) or json (for scripts, e.g. piping to jq)
+
 REQUIRED FOR CREATE ACTION:
     --kernel        Kernel filename (must exist in KERNEL_PATH directory, can be set in config as KERNEL)
     --image         Image filename (must exist in IMAGES_PATH directory, can be set in config as IMAGE)
@@ -102,13 +103,20 @@ EXAMPLE USAGE:
     # List all VMs
     ./firecracker_vm_manager.py list
 
+    # List all VMs as JSON
+    ./firecracker_vm_manager.py list --format json
+
 PREREQUISITES:
     - Root/sudo access for network configuration and supervisor management
     - Supervisor daemon running
     - resize2fs utility for rootfs resizing
-    - Python dependencies: pip install requests requests-unixsocket
+
 """
-    print(help_text)
+
+
+def show_help_and_exit():
+    """Show help message with examples and exit"""
+    sys.stdout.write(_HELP_TEXT)
     sys.exit(0)
 
 
@@ -119,19 +127,16 @@ def format_kernels_table(kernel_files):
         print("Looking for files matching: vmlinux*, bzImage*, kernel*, Image*")
         return
     
-    print()
-    print(f"{'Filename':<30} {'Size':<10} {'Modified'}")
-    print('-' * 55)
-    
+    # Build the whole table and write it in one go
+    lines = ["", f"{'Filename':<30} {'Size':<10} {'Modified'}", '-' * 55]
     for kernel in kernel_files:
-        filename = kernel['filename']
-        size = kernel['size']
-        modified = kernel['modified']
-        print(f"{filename:<30} {size:<10} {modified}")
-    
-    print()
-    print("Usage: ./fcm create --kernel <filename> ...")
-    print(f"Example: ./fcm create --kernel {kernel_files[0]['filename']} ...")
+        lines.append(f"{kernel['filename']:<30} {kernel['size']:<10} {kernel['modified']}")
+    lines += [
+        "",
+        "Usage: ./fcm create --kernel <filename> ...",
+        f"Example: ./fcm create --kernel {kernel_files[0]['filename']} ...",
+    ]
+    sys.stdout.write('\n'.join(lines) + '\n')
 
 
 def format_images_table(image_files):
@@ -141,80 +146,39 @@ def format_images_table(image_files):
         print("Looking for files matching: *.ext4, *.ext3, *.ext2, *.img, *.qcow2, *.raw")
         return
     
-    print()
-    print(f"{'Filename':<30} {'Size':<10} {'Modified'}")
-    print('-' * 55)
-    
+    # Build the whole table and write it in one go
+    lines = ["", f"{'Filename':<30} {'Size':<10} {'Modified'}", '-' * 55]
     for image in image_files:
-        filename = image['filename']
-        size = image['size']
-        modified = image['modified']
-        print(f"{filename:<30} {size:<10} {modified}")
-    
-    print()
-    print("Usage: ./fcm create --image <filename> ...")
-    print(f"Example: ./fcm create --image {image_files[0]['filename']} ...")
+        lines.append(f"{image['filename']:<30} {image['size']:<10} {image['modified']}")
+    lines += [
+        "",
+        "Usage: ./fcm create --image <filename> ...",
+        f"Example: ./fcm create --image {image_files[0]['filename']} ...",
+    ]
+    sys.stdout.write('\n'.join(lines) + '\n')
 
 
 def format_vms_table(all_vms):
     """Format VM information as a table for CLI display"""
-    from pathlib import Path
-    
     if not all_vms:
         print("No VMs found.")
         return
     
+    headers = ['VM Name', 'State', 'Internal IP', 'CPUs', 'Memory', 'Rootfs', 
+               'Base Image', 'Kernel', 'TAP Interface (IP)', 'MMDS TAP', 'Network Driver']
+    
     # Build table data
     table_data = []
     for vm in all_vms:
-        # Extract relevant fields from the VM data structure
+        # Display fields are resolved by VMDiscovery from the live or cached config
         vm_name = vm['name']
         state = vm['state']
-        
-        # Get configuration from appropriate source
-        config = vm.get('config')
-        cached_config = vm.get('cached_config', {})
-        
-        # Determine values based on state
-        if state == 'running' and config:
-            # Use live API config for running VMs
-            machine_config = config.get('machine-config', {})
-            cpus = machine_config.get('vcpu_count', 'N/A')
-            memory = machine_config.get('mem_size_mib', 'N/A')
-            
-            # Get kernel name
-            boot_source = config.get('boot-source', {})
-            kernel_path = boot_source.get('kernel_image_path', 'N/A')
-            kernel_name = Path(kernel_path).name if kernel_path != 'N/A' else 'N/A'
-            
-            # Get rootfs name
-            drives = config.get('drives', [])
-            rootfs_filename = 'N/A'
-            for drive in drives:
-                if drive.get('drive_id') == 'rootfs':
-                    rootfs_path = drive.get('path_on_host', 'N/A')
-                    rootfs_filename = Path(rootfs_path).name if rootfs_path != 'N/A' else 'N/A'
-                    break
-            
-            # Get network info
-            network_interfaces = config.get('network-interfaces', [])
-            tap_device = 'N/A'
-            mmds_tap = 'N/A'
-            for iface in network_interfaces:
-                if iface.get('iface_id') == 'eth0':
-                    tap_device = iface.get('host_dev_name', 'N/A')
-                elif iface.get('iface_id') == 'mmds0':
-                    mmds_tap = iface.get('host_dev_name', 'N/A')
-        else:
-            # Use cached config for stopped VMs
-            cpus = cached_config.get('cpus', 'N/A')
-            memory = cached_config.get('memory', 'N/A')
-            kernel_path = cached_config.get('kernel', 'N/A')
-            kernel_name = Path(kernel_path).name if kernel_path != 'N/A' else 'N/A'
-            rootfs_path = cached_config.get('rootfs', 'N/A')
-            rootfs_filename = Path(rootfs_path).name if rootfs_path != 'N/A' else 'N/A'
-            tap_device = cached_config.get('tap_device', 'N/A')
-            mmds_tap = cached_config.get('mmds_tap', 'N/A')
+        cpus = vm.get('cpus', 'N/A')
+        memory = vm.get('memory', 'N/A')
+        kernel_name = vm.get('kernel_name', 'N/A')
+        rootfs_filename = vm.get('rootfs_filename', 'N/A')
+        tap_device = vm.get('tap_device', 'N/A')
+        mmds_tap = vm.get('mmds_tap', 'N/A')
         
         # Get additional info from VM data
         vm_ip = vm.get('vm_ip', 'N/A')
@@ -228,37 +192,133 @@ def format_vms_table(all_vms):
         # Format TAP with IP
         tap_str = f"{tap_device} ({tap_ip})" if tap_device != 'N/A' and tap_ip != 'N/A' else tap_device
         
-        table_data.append([
-            vm_name, state, vm_ip, str(cpus), memory_str, 
+        # Stringify every cell once; width calculation and output reuse the strings
+        row = [str(cell) for cell in (
+            vm_name, state, vm_ip, cpus, memory_str, 
             rootfs_filename, base_image, kernel_name, 
             tap_str, mmds_tap, networkdriver
-        ])
+        )]
+        table_data.append(row)
     
-    # Print table
-    headers = ['VM Name', 'State', 'Internal IP', 'CPUs', 'Memory', 'Rootfs', 
-               'Base Image', 'Kernel', 'TAP Interface (IP)', 'MMDS TAP', 'Network Driver']
-    
-    # Calculate column widths
-    widths = [len(h) for h in headers]
-    for row in table_data:
-        for i, cell in enumerate(row):
-            widths[i] = max(widths[i], len(str(cell)))
+    # Calculate column widths one column at a time over the transposed rows
+    widths = [max(len(header), max(map(len, column))) for header, column in zip(headers, zip(*table_data))]
     
-    # Print header
-    header_line = ' | '.join(h.ljust(w) for h, w in zip(headers, widths))
-    print(header_line)
-    print('-+-'.join('-' * w for w in widths))
+    # Print table
+    # One format template for the final widths pads every cell of a row in a single call
+    row_fmt = ' | '.join(f"{{:<{w}}}" for w in widths)
     
-    # Print rows
-    for row in table_data:
-        row_line = ' | '.join(str(cell).ljust(w) for cell, w in zip(row, widths))
-        print(row_line)
+    # Build header, separator and rows, then write them in one go
+    lines = [row_fmt.format(*headers), '-+-'.join('-' * w for w in widths)]
+    lines += [row_fmt.format(*row) for row in table_data]
+    sys.stdout.write('\n'.join(lines) + '\n')
+
+
+def _action_kernels(args, config_manager):
+    """List available kernels"""
+    from lib.filesystem_manager import FilesystemManager
+
+    filesystem_manager = FilesystemManager(config_manager)
+    kernel_files = filesystem_manager.get_available_kernels()
+    if kernel_files is None:  # Error occurred
+        return False
+    # Get kernel path for display
+    env_config = config_manager.get_env_config()
+    kernel_path = env_config.get('KERNEL_PATH', '/var/lib/firecracker/kernels')
+    print(f"Available kernels in {kernel_path}:")
+    format_kernels_table(kernel_files)
+    return True
+
+
+def _action_images(args, config_manager):
+    """List available images"""
+    from lib.filesystem_manager import FilesystemManager
+
+    filesystem_manager = FilesystemManager(config_manager)
+    image_files = filesystem_manager.get_available_images()
+    if image_files is None:  # Error occurred
+        return False
+    # Get images path for display
+    env_config = config_manager.get_env_config()
+    images_path = env_config.get('IMAGES_PATH', '/var/lib/firecracker/images')
+    print(f"Available images in {images_path}:")
+    format_images_table(image_files)
+    return True
+
+
+def _action_list(args, config_manager):
+    """List all VMs (both running and stopped)"""
+    from lib.vm_discovery import VMDiscovery
+
+    vm_discovery = VMDiscovery(config_manager)
+    # Progress lines would corrupt the JSON document on stdout
+    all_vms = vm_discovery.discover_all_vms(quiet=args.format == "json")
+    if args.format == "json":
+        # Machine-readable output for scripts, skips the table layout entirely
+        import json
+        sys.stdout.write(json.dumps(all_vms, default=str) + "\n")
+    else:
+        format_vms_table(all_vms)
+    return True  # No need to check success for list action
+
+
+def _vm_lifecycle(args, config_manager):
+    """Create the lifecycle manager for the VM an action operates on"""
+    from lib.vm_lifecycle import VMLifecycle
+
+    # Use custom socket path if provided, otherwise use VM name
+    return VMLifecycle(args.socket if args.socket else args.name, config_manager)
 
 
-def main():
+def _action_create(args, config_manager):
+    """Create a VM; VMLifecycle handles the entire creation process"""
+    return _vm_lifecycle(args, config_manager).create_vm(args)
+
+
+def _action_destroy(args, config_manager):
+    """Destroy a VM and clean up all resources"""
+    return _vm_lifecycle(args, config_manager).destroy_vm(
+        vm_name=args.name,
+        force_destroy=args.force_destroy
+    )
+
+
+def _action_stop(args, config_manager):
+    """Stop a running VM"""
+    return _vm_lifecycle(args, config_manager).stop_vm(vm_name=args.name)
+
+
+def _action_start(args, config_manager):
+    """Start a stopped VM"""
+    return _vm_lifecycle(args, config_manager).start_vm(vm_name=args.name)
+
+
+def _action_restart(args, config_manager):
+    """Restart a VM (stop then start)"""
+    return _vm_lifecycle(args, config_manager).restart_vm(vm_name=args.name)
+
+
+# Handler for each action; each returns True on success. Every handler imports only
+# the lib module it needs.
+_ACTIONS = {
+    "create": _action_create,
+    "destroy": _action_destroy,
+    "stop": _action_stop,
+    "start": _action_start,
+    "restart": _action_restart,
+    "list": _action_list,
+    "kernels": _action_kernels,
+    "images": _action_images,
+}
+
+
+@functools.lru_cache(maxsize=1)
+def _build_parser():
+    """Build the command line argument parser (once per process, reused by every main() call)"""
+    import argparse  # Not needed for the help fast path in main()
+
     parser = argparse.ArgumentParser(description="Manage Firecracker VMs", add_help=False)
-    parser.add_argument("action", nargs="?", choices=["create", "destroy", "stop", "start", "restart", "list", "kernels", "images"], help="Action to perform")
-    parser.add_argument("--version", "-v", action="version", version=f"Firecracker VM Manager {__version__}")
+    parser.add_argument("action", nargs="?", choices=_ACTIONS.keys(), help="Action to perform")
+    parser.add_argument("--version", "-v", action="version", version=_VERSION_TEXT)
     parser.add_argument("--name", help="Name of the VM")
     parser.add_argument("--socket", help="Path to Firecracker API socket (default: /var/run/firecracker/<vm_name>.sock)")
     parser.add_argument("--kernel", help="Kernel filename (must exist in KERNEL_PATH directory, can be set in config as KERNEL)")
@@ -275,15 +335,39 @@ def main():
     parser.add_argument("--foreground", action="store_true", help="Run Firecracker in foreground for debugging")
     parser.add_argument("--force-rootfs", action="store_true", help="Force overwrite existing rootfs file if it exists")
     parser.add_argument("--force-destroy", action="store_true", help="Force destroy without confirmation prompt")
-    parser.add_argument("--networkdriver", choices=["internal", "external"], default="internal", help="Network driver mode: 'internal' (default) manages TAP devices, 'external' uses existing TAP devices")
+    parser.add_argument("--networkdriver", choices=("internal", "external"), default="internal", help="Network driver mode: 'internal' (default) manages TAP devices, 'external' uses existing TAP devices")
     parser.add_argument("--config", help="Path to configuration file (default: /etc/firecracker.env)")
+    parser.add_argument("--format", choices=("table", "json"), default="table", help="Output format of the list action: 'table' (default) or 'json'")
     parser.add_argument("--help", "-h", action="store_true", help="Show help message")
+    return parser
+
+
+def main(argv=None):
+    """Run the VM manager
 
-    args = parser.parse_args()
+    Args:
+        argv: Argument list without the program name (defaults to sys.argv[1:]).
+              Lets a driver script import this module once and call main() repeatedly.
+    """
+    if argv is None:
+        argv = sys.argv[1:]
 
-    # Show help if requested or no action specified
-    if args.help or not args.action:
+    # Help and version requests are answered before the argument parser is built
+    if not argv or "-h" in argv or "--help" in argv:
         show_help_and_exit()
+    if "-v" in argv or "--version" in argv:
+        sys.stdout.write(f"{_VERSION_TEXT}\n")
+        sys.exit(0)
+
+    args = _build_parser().parse_args(argv)
+
+    # Show help if no action specified
+    if not args.action:
+        show_help_and_exit()
+
+    # lib modules are imported only once they are needed, and only those the action
+    # uses, so help output and read-only actions don't load the whole package
+    from lib.config_manager import ConfigManager
 
     # Initialize configuration manager with config file
     config_manager = ConfigManager(config_file=args.config)
@@ -296,72 +380,11 @@ def main():
     # Validate action parameters
     success, error_msg = config_manager.validate_action_parameters(args.action, args)
     if not success:
-        print(error_msg, file=sys.stderr)
-        show_help_and_exit()
-
-    if args.action == "kernels":
-        # List available kernels
-        filesystem_manager = FilesystemManager(config_manager)
-        kernel_files = filesystem_manager.get_available_kernels()
-        if kernel_files is None:  # Error occurred
-            sys.exit(1)
-        # Get kernel path for display
-        env_config = config_manager.get_env_config()
-        kernel_path = env_config.get('KERNEL_PATH', '/var/lib/firecracker/kernels')
-        print(f"Available kernels in {kernel_path}:")
-        format_kernels_table(kernel_files)
-        return
+        # Exit status 2 like argparse usage errors, so scripts notice the failure
+        sys.stderr.write(f"{error_msg}\n{_USAGE_TEXT}")
+        sys.exit(2)
 
-    elif args.action == "images":
-        # List available images
-        filesystem_manager = FilesystemManager(config_manager)
-        image_files = filesystem_manager.get_available_images()
-        if image_files is None:  # Error occurred
-            sys.exit(1)
-        # Get images path for display
-        env_config = config_manager.get_env_config()
-        images_path = env_config.get('IMAGES_PATH', '/var/lib/firecracker/images')
-        print(f"Available images in {images_path}:")
-        format_images_table(image_files)
-        return
-
-    elif args.action == "list":
-        # List all VMs (both running and stopped)
-        vm_discovery = VMDiscovery(config_manager)
-        all_vms = vm_discovery.discover_all_vms()
-        format_vms_table(all_vms)
-        return  # No need to check success for list action
-
-    elif args.action == "create":
-        # Create VM lifecycle manager and delegate entire creation process
-        # Use custom socket path if provided, otherwise use VM name
-        vm_lifecycle = VMLifecycle(args.socket if args.socket else args.name, config_manager)
-        success = vm_lifecycle.create_vm(args)
-
-    elif args.action == "destroy":
-        # Destroy a VM and clean up all resources
-        vm_lifecycle = VMLifecycle(args.socket if args.socket else args.name, config_manager)
-        success = vm_lifecycle.destroy_vm(
-            vm_name=args.name,
-            force_destroy=args.force_destroy
-        )
-    
-    elif args.action == "stop":
-        # Stop a running VM
-        vm_lifecycle = VMLifecycle(args.socket if args.socket else args.name, config_manager)
-        success = vm_lifecycle.stop_vm(vm_name=args.name)
-    
-    elif args.action == "start":
-        # Start a stopped VM
-        vm_lifecycle = VMLifecycle(args.socket if args.socket else args.name, config_manager)
-        success = vm_lifecycle.start_vm(vm_name=args.name)
-    
-    elif args.action == "restart":
-        # Restart a VM (stop then start)
-        vm_lifecycle = VMLifecycle(args.socket if args.socket else args.name, config_manager)
-        success = vm_lifecycle.restart_vm(vm_name=args.name)
-
-    if not success:
+    if not _ACTIONS[args.action](args, config_manager):
         sys.exit(1)
 
 
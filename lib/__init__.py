@@ -8,24 +8,36 @@ This package contains the core modules for managing Firecracker VMs:
 - config_manager: Environment configuration and VM caching
 - vm_discovery: VM discovery and state monitoring
 - vm_lifecycle: VM lifecycle operations (create, destroy, start, stop)
+- supervisor_client: supervisord control over XML-RPC with supervisorctl fallback
 """
 
 __version__ = "1.0.0"
 __author__ = "Firecracker VM Manager"
 
-# Import main classes for convenience
-from .firecracker_api import FirecrackerAPI
-from .network_manager import NetworkManager
-from .filesystem_manager import FilesystemManager
-from .config_manager import ConfigManager
-from .vm_discovery import VMDiscovery
-from .vm_lifecycle import VMLifecycle
-
-__all__ = [
-    'FirecrackerAPI',
-    'NetworkManager', 
-    'FilesystemManager',
-    'ConfigManager',
-    'VMDiscovery',
-    'VMLifecycle'
-]
\ No newline at end of file
+# Main classes, exported for convenience. They are imported on first access
+# (PEP 562), so importing the package or one submodule doesn't load all of them.
+_EXPORTS = {
+    'FirecrackerAPI': 'firecracker_api',
+    'NetworkManager': 'network_manager',
+    'FilesystemManager': 'filesystem_manager',
+    'ConfigManager': 'config_manager',
+    'VMDiscovery': 'vm_discovery',
+    'VMLifecycle': 'vm_lifecycle',
+    'SupervisorClient': 'supervisor_client',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    import importlib
+    value = getattr(importlib.import_module(f".{module_name}", __name__), name)
+    globals()[name] = value  # Later lookups no longer go through __getattr__
+    return value
+
+
+def __dir__():
+    return sorted({*globals(), *_EXPORTS})
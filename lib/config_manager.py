@@ -1,27 +1,140 @@
 #!/usr/bin/env python3
 
 import json
+import os
+import re
+import stat
 import subprocess
 import sys
 import time
-from pathlib import Path
+
+# KEY=value lines of the config file; whole-line and trailing '#' comments are ignored
+_ENV_LINE_RE = re.compile(r'^[ \t]*([^\s#=][^=\n]*)=([^#\n]*)', re.MULTILINE)
+
+# Parsed metadata files: absolute path -> (mtime_ns, size, parsed value), see _load_cached()
+_METADATA_FILE_CACHE = {}
+
+# Parsed config files, stored the same way, for processes that call main() repeatedly
+_ENV_FILE_CACHE = {}
+
+# Command line options that fall back to a config file key: (args attribute, key, type)
+_ENV_ARG_DEFAULTS = (
+    ('kernel', 'KERNEL', str),
+    ('image', 'IMAGE', str),
+    ('rootfs_size', 'ROOTFS_SIZE', str),
+    ('cpus', 'CPUS', int),
+    ('memory', 'MEMORY', int),
+)
+
+# Options the create action requires: (option name, args attribute, config file hint)
+_CREATE_REQUIRED = (
+    ('kernel', 'kernel', 'KERNEL=<filename>'),
+    ('image', 'image', 'IMAGE=<filename>'),
+    ('rootfs-size', 'rootfs_size', 'ROOTFS_SIZE=<size>'),
+    ('tap-ip', 'tap_ip', None),
+    ('vm-ip', 'vm_ip', None),
+    ('cpus', 'cpus', 'CPUS=<number>'),
+    ('memory', 'memory', 'MEMORY=<mb>'),
+)
+
+# Actions that only read paths, cache files and API sockets; they never run Firecracker
+# and don't operate on a single VM's socket
+_READ_ONLY_ACTIONS = frozenset({"list", "kernels", "images"})
+
+
+def _load_cached(cache, path, parse):
+    """Parse a file, reusing the cached result while its stat signature is unchanged
+    
+    Each path holds a single entry that is replaced when the file changes, so the
+    cache does not grow with every edit of the file.
+    
+    Args:
+        cache: Module-level cache dict
+        path: File path (raises FileNotFoundError if missing)
+        parse: Callable that reads and parses the file at path
+    
+    Returns:
+        The parsed value (shared, callers must not modify it)
+    """
+    st = os.stat(path)
+    key = os.path.abspath(path)
+    entry = cache.get(key)
+    if entry is not None and entry[0] == st.st_mtime_ns and entry[1] == st.st_size:
+        return entry[2]
+    value = parse(path)
+    cache[key] = (st.st_mtime_ns, st.st_size, value)
+    return value
+
+
+def _parse_env_file(path):
+    """Read a config file and parse the whole file in one regex pass"""
+    with open(path) as f:
+        text = f.read()
+    return {key.strip(): value.strip() for key, value in _ENV_LINE_RE.findall(text)}
+
+
+def _parse_json_file(path):
+    """Read a JSON file in one unbuffered readall() and decode the raw bytes directly,
+    so the payload is not copied through a text or buffered reader"""
+    with open(path, 'rb', buffering=0) as f:
+        return json.loads(f.read())
+
+
+def atomic_write(path, data, mode=0o644):
+    """Write a file durably and atomically
+    
+    The data goes to "<path>.tmp" opened with O_DSYNC, so each write is on disk when
+    it returns and no separate fsync is needed, and is then renamed over the target.
+    Readers see either the old or the complete new file, never a partial one. The
+    parent directory is fsynced afterwards so the rename itself survives a crash.
+    
+    Args:
+        path: Target file path
+        data: File content as bytes
+        mode: Permission bits for a newly created file
+    """
+    tmp_path = f"{path}.tmp"
+    try:
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_DSYNC, mode)
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view):]
+        finally:
+            os.close(fd)
+        os.rename(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    
+    # The rename is recorded in the directory, which O_DSYNC on the file doesn't cover
+    dir_fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
 
 
 class ConfigManager:
     """Manages environment configuration, VM caching, and metadata parsing"""
     
     def __init__(self, cache_dir=None, config_file=None):
+        # Paths are kept as plain strings, no Path objects are needed for os calls and joins
+        
         # Use provided cache_dir or default to /var/lib/firecracker/cache
         if cache_dir:
-            self.cache_dir = Path(cache_dir)
+            self.cache_dir = os.fspath(cache_dir)
         else:
-            self.cache_dir = Path("/var/lib/firecracker/cache")
+            self.cache_dir = "/var/lib/firecracker/cache"
         
         # Use provided config_file or default to /etc/firecracker.env
         if config_file:
-            self.config_file = Path(config_file)
+            self.config_file = os.fspath(config_file)
         else:
-            self.config_file = Path("/etc/firecracker.env")
+            self.config_file = "/etc/firecracker.env"
         
         # Store base path for standard directory structure
         self.base_path = "/var/lib/firecracker"
@@ -38,65 +151,71 @@ class ConfigManager:
         """Load configuration from config file"""
         config = {}
         
-        if self.config_file.exists():
-            try:
-                with open(self.config_file, 'r') as f:
-                    for line in f:
-                        line = line.strip()
-                        # Skip comments and empty lines
-                        if line and not line.startswith('#'):
-                            if '=' in line:
-                                key, value = line.split('=', 1)
-                                # Strip inline comments (everything after #)
-                                if '#' in value:
-                                    value = value.split('#')[0]
-                                config[key.strip()] = value.strip()
-            except Exception as e:
-                print(f"Warning: Could not read config file {self.config_file}: {e}", file=sys.stderr)
+        try:
+            # Only re-read the file when it changed; a missing file is not an error
+            cached = _load_cached(_ENV_FILE_CACHE, self.config_file, _parse_env_file)
+            # Copy, since callers fill in defaults on the returned dict
+            config = dict(cached)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Warning: Could not read config file {self.config_file}: {e}", file=sys.stderr)
         
         return config
     
     def parse_metadata(self, metadata_arg, tap_ip, vm_ip, hostname=None):
         """Parse metadata from command line argument and add network config"""
-        metadata = {}
+        network_config = {
+            'ip': vm_ip,
+            'gateway': tap_ip,
+            'hostname': hostname
+        }
+        
+        # Without user metadata only the network_config object is published
+        if not metadata_arg:
+            return {'network_config': network_config}
         
         # Parse user-provided metadata
-        if metadata_arg:
-            if metadata_arg.startswith('@'):
-                # Read from file
-                file_path = metadata_arg[1:]
-                try:
-                    with open(file_path, 'r') as f:
-                        user_metadata = json.load(f)
-                    metadata.update(user_metadata)
-                except FileNotFoundError:
-                    print(f"Error: Metadata file not found: {file_path}", file=sys.stderr)
-                    return None
-                except json.JSONDecodeError as e:
-                    print(f"Error: Invalid JSON in metadata file {file_path}: {e}", file=sys.stderr)
-                    return None
-            else:
-                # Parse JSON string directly
-                try:
-                    user_metadata = json.loads(metadata_arg)
-                    metadata.update(user_metadata)
-                except json.JSONDecodeError as e:
-                    print(f"Error: Invalid JSON in metadata argument: {e}", file=sys.stderr)
-                    return None
+        if metadata_arg.startswith('@'):
+            # Read from file
+            file_path = metadata_arg[1:]
+            try:
+                # Copy, since the parsed file content is cached and must not be modified
+                metadata = dict(self._load_metadata_file(file_path))
+            except FileNotFoundError:
+                print(f"Error: Metadata file not found: {file_path}", file=sys.stderr)
+                return None
+            except json.JSONDecodeError as e:
+                print(f"Error: Invalid JSON in metadata file {file_path}: {e}", file=sys.stderr)
+                return None
+        else:
+            # Parse JSON string directly; the result is fresh and can be used as is
+            try:
+                metadata = json.loads(metadata_arg)
+            except json.JSONDecodeError as e:
+                print(f"Error: Invalid JSON in metadata argument: {e}", file=sys.stderr)
+                return None
         
         # Always add network_config object
-        metadata['network_config'] = {
-                'ip': vm_ip,
-                'gateway': tap_ip,
-                'hostname': hostname
-            }
+        metadata['network_config'] = network_config
         
         return metadata
     
+    def _load_metadata_file(self, file_path):
+        """Load a metadata JSON file, reusing the parsed result while the file is unchanged
+
+        Args:
+            file_path: Path to the metadata JSON file
+
+        Returns:
+            dict: Parsed metadata (raises FileNotFoundError / json.JSONDecodeError)
+        """
+        return _load_cached(_METADATA_FILE_CACHE, file_path, _parse_json_file)
+    
     def _ensure_cache_directory(self):
         """Create cache directory if it doesn't exist"""
         try:
-            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            os.makedirs(self.cache_dir, exist_ok=True)
             return True
         except Exception as e:
             print(f"Error creating cache directory: {e}", file=sys.stderr)
@@ -104,7 +223,7 @@ class ConfigManager:
     
     def _get_cache_file_path(self, vm_name):
         """Get the cache file path for a VM"""
-        return self.cache_dir / f"{vm_name}.json"
+        return os.path.join(self.cache_dir, f"{vm_name}.json")
     
     def save_vm_config(self, vm_name, kernel_path, rootfs_path, tap_device, mmds_tap, vm_ip, tap_ip, cpus, memory, hostname, base_image=None, networkdriver="internal"):
         """Save VM configuration to cache file"""
@@ -128,8 +247,10 @@ class ConfigManager:
         
         cache_file = self._get_cache_file_path(vm_name)
         try:
-            with open(cache_file, 'w') as f:
-                json.dump(cache_data, f, indent=2)
+            # Serialize up front and write the encoded document atomically so a crash
+            # can't leave a truncated cache file. The temporary "<name>.json.tmp" is
+            # not matched by the *.json scans.
+            atomic_write(cache_file, json.dumps(cache_data, indent=2).encode())
             print(f"✓ VM configuration cached: {cache_file}")
             return True
         except Exception as e:
@@ -140,16 +261,15 @@ class ConfigManager:
         """Load VM configuration from cache file"""
         cache_file = self._get_cache_file_path(vm_name)
         
-        if not cache_file.exists():
-            print(f"Error: No cached configuration found for VM '{vm_name}'", file=sys.stderr)
-            print(f"Cache file expected at: {cache_file}", file=sys.stderr)
-            return None
-        
         try:
-            with open(cache_file, 'r') as f:
-                cache_data = json.load(f)
+            with open(cache_file, 'rb') as f:
+                cache_data = json.loads(f.read())
             print(f"✓ VM configuration loaded from cache: {cache_file}")
             return cache_data
+        except FileNotFoundError:
+            print(f"Error: No cached configuration found for VM '{vm_name}'", file=sys.stderr)
+            print(f"Cache file expected at: {cache_file}", file=sys.stderr)
+            return None
         except Exception as e:
             print(f"Error loading VM config from cache: {e}", file=sys.stderr)
             return None
@@ -159,11 +279,11 @@ class ConfigManager:
         cache_file = self._get_cache_file_path(vm_name)
         
         try:
-            if cache_file.exists():
-                cache_file.unlink()
-                print(f"✓ VM configuration cache removed: {cache_file}")
-            else:
-                print(f"✓ VM configuration cache doesn't exist: {cache_file}")
+            os.unlink(cache_file)
+            print(f"✓ VM configuration cache removed: {cache_file}")
+            return True
+        except FileNotFoundError:
+            print(f"✓ VM configuration cache doesn't exist: {cache_file}")
             return True
         except Exception as e:
             print(f"Error removing VM config cache: {e}", file=sys.stderr)
@@ -171,15 +291,44 @@ class ConfigManager:
     
     def get_all_cached_vms(self):
         """Get list of all cached VM names"""
-        if not self.cache_dir.exists():
-            return []
+        return [entry.name[:-5] for entry in self._scan_cache_dir()]  # name without .json extension
+    
+    def load_all_vm_configs(self, quiet=False):
+        """Load every cached VM configuration in one pass over the cache directory
         
-        cached_vms = []
-        for cache_file in self.cache_dir.glob("*.json"):
-            vm_name = cache_file.stem  # filename without .json extension
-            cached_vms.append(vm_name)
+        Corrupted or unreadable cache files are skipped.
+        
+        Args:
+            quiet: Don't print a progress line per loaded file (keeps stdout clean)
+        
+        Returns:
+            dict: VM name -> cached configuration, in directory order
+        """
+        configs = {}
+        for entry in self._scan_cache_dir():
+            try:
+                with open(entry.path, 'rb') as f:
+                    cache_data = json.loads(f.read())
+            except Exception as e:
+                print(f"Error loading VM config from cache: {e}", file=sys.stderr)
+                continue
+            if cache_data:
+                if not quiet:
+                    print(f"✓ VM configuration loaded from cache: {entry.path}")
+                configs[entry.name[:-5]] = cache_data  # name without .json extension
+        return configs
+    
+    def _scan_cache_dir(self):
+        """List the *.json entries of the cache directory with a single scandir
         
-        return cached_vms
+        Returns:
+            list: os.DirEntry objects (empty if the cache directory doesn't exist)
+        """
+        try:
+            with os.scandir(self.cache_dir) as entries:
+                return [entry for entry in entries if entry.name.endswith('.json') and not entry.name.startswith('.')]
+        except FileNotFoundError:
+            return []
     
     def setup_environment(self, args):
         """Perform all preflight checks and environment setup
@@ -190,8 +339,10 @@ class ConfigManager:
         Returns:
             bool: True if setup successful, False otherwise
         """
-        # Check Firecracker binary first
-        if not self._check_firecracker_binary():
+        action = getattr(args, 'action', None)
+        
+        # Check Firecracker binary first (read-only actions don't execute it)
+        if action not in _READ_ONLY_ACTIONS and not self._check_firecracker_binary():
             return False
         
         # Load configuration from config file
@@ -217,10 +368,9 @@ class ConfigManager:
         self._apply_env_config_to_args(args)
         
         # Set default socket path if not provided (not needed for list, kernels, or images actions)
-        if not args.socket and hasattr(args, 'action') and args.action not in ["list", "kernels", "images"]:
+        if not args.socket and action is not None and action not in _READ_ONLY_ACTIONS:
             if args.name:
-                socket_path_prefix = self.env_config.get('SOCKET_PATH_PREFIX', '/var/run/firecracker')
-                args.socket = str(Path(socket_path_prefix) / f"{args.name}.sock")
+                args.socket = self.get_vm_socket_path(args.name)
         
         return True
     
@@ -236,15 +386,17 @@ class ConfigManager:
             
         firecracker_path = "/usr/sbin/firecracker"
         
-        # Check if the binary exists
-        if not Path(firecracker_path).exists():
+        # Check if the binary exists (one stat answers both checks)
+        try:
+            st_mode = os.stat(firecracker_path).st_mode
+        except OSError:
             print(f"Error: Firecracker binary not found at {firecracker_path}", file=sys.stderr)
             print("Please install Firecracker before using this tool.", file=sys.stderr)
             print("Visit: https://github.com/firecracker-microvm/firecracker/releases", file=sys.stderr)
             return False
         
         # Check if it's executable
-        if not Path(firecracker_path).is_file():
+        if not stat.S_ISREG(st_mode):
             print(f"Error: {firecracker_path} is not a regular file", file=sys.stderr)
             return False
         
@@ -300,15 +452,27 @@ class ConfigManager:
         ]
         
         for dir_path in required_dirs:
+            # Usually all directories exist already; one stat is cheaper than makedirs(),
+            # which stats the parent and then fails in mkdir
+            if os.path.isdir(dir_path):
+                continue
             try:
-                Path(dir_path).mkdir(parents=True, exist_ok=True)
-                # Only print message for socket directory (others are data directories)
-                if dir_path == self.env_config.get('SOCKET_PATH_PREFIX'):
-                    if not Path(dir_path).exists():
-                        print(f"Created socket directory: {dir_path}")
+                os.makedirs(dir_path)
+            except FileExistsError as e:
+                # Fine if another invocation created it concurrently, but not if the
+                # path is taken by something that isn't a directory
+                if not os.path.isdir(dir_path):
+                    print(f"Warning: Could not create directory {dir_path}: {e}", file=sys.stderr)
+                continue
             except Exception as e:
                 print(f"Warning: Could not create directory {dir_path}: {e}", file=sys.stderr)
                 # Continue anyway, as some operations might still work
+                continue
+            
+            # Only print message for socket directory (others are data directories).
+            # stderr, so machine-readable output on stdout (list --format json) stays clean
+            if dir_path == self.env_config.get('SOCKET_PATH_PREFIX'):
+                print(f"Created socket directory: {dir_path}", file=sys.stderr)
         
         return True
     
@@ -318,31 +482,14 @@ class ConfigManager:
         Args:
             args: Command line arguments from argparse
         """
-        # Set kernel from config if not provided via command line
-        if not args.kernel and 'KERNEL' in self.env_config and self.env_config['KERNEL']:
-            args.kernel = self.env_config['KERNEL']
-        
-        # Set image from config if not provided via command line  
-        if not args.image and 'IMAGE' in self.env_config and self.env_config['IMAGE']:
-            args.image = self.env_config['IMAGE']
-        
-        # Set rootfs size from config if not provided via command line
-        if not args.rootfs_size and 'ROOTFS_SIZE' in self.env_config:
-            args.rootfs_size = self.env_config['ROOTFS_SIZE']
-        
-        # Set CPU count from config if available
-        if not args.cpus and 'CPUS' in self.env_config:
-            try:
-                args.cpus = int(self.env_config['CPUS'])
-            except ValueError:
-                print(f"Warning: Invalid CPUS value in config file: {self.env_config['CPUS']}", file=sys.stderr)
-        
-        # Set memory from config if available
-        if not args.memory and 'MEMORY' in self.env_config:
-            try:
-                args.memory = int(self.env_config['MEMORY'])
-            except ValueError:
-                print(f"Warning: Invalid MEMORY value in config file: {self.env_config['MEMORY']}", file=sys.stderr)
+        # Fill every option not given on the command line from its config key
+        for attr, key, cast in _ENV_ARG_DEFAULTS:
+            value = self.env_config.get(key)
+            if value and not getattr(args, attr):
+                try:
+                    setattr(args, attr, cast(value))
+                except ValueError:
+                    print(f"Warning: Invalid {key} value in config file: {value}", file=sys.stderr)
     
     def get_env_config(self):
         """Get the loaded environment configuration
@@ -369,8 +516,7 @@ class ConfigManager:
         Returns:
             str: Full path to the VM's socket file
         """
-        socket_prefix = self.get_socket_path_prefix()
-        return str(Path(socket_prefix) / f"{vm_name}.sock")
+        return os.path.join(self.get_socket_path_prefix(), f"{vm_name}.sock")
     
     def validate_action_parameters(self, action, args):
         """Validate that required parameters are present for the given action
@@ -383,7 +529,7 @@ class ConfigManager:
             tuple: (bool success, str error_message or None)
         """
         # Check for basic required parameters (except for list, kernels, and images actions)
-        if not args.name and action not in ["list", "kernels", "images"]:
+        if not args.name and action not in _READ_ONLY_ACTIONS:
             return False, "Error: --name is required for create, destroy, stop, start, and restart actions"
         
         return True, None
@@ -397,31 +543,17 @@ class ConfigManager:
         Returns:
             tuple: (bool success, str error_message or None)
         """
-        create_required = {
-            "kernel": args.kernel,
-            "image": args.image,
-            "rootfs-size": args.rootfs_size,
-            "tap-ip": args.tap_ip,
-            "vm-ip": args.vm_ip,
-            "cpus": args.cpus,
-            "memory": args.memory
-        }
-        
-        missing_params = [param for param, value in create_required.items() if not value]
+        # One pass collects the missing options and their config file hints together
+        missing_params = []
+        env_hints = []
+        for param, attr, env_hint in _CREATE_REQUIRED:
+            if not getattr(args, attr):
+                missing_params.append(param)
+                if env_hint:
+                    env_hints.append(env_hint)
         
         if missing_params:
             error_msg = f"Error: Missing required parameter(s) for create action: {', '.join(['--' + p for p in missing_params])}"
-            env_hints = []
-            if 'kernel' in missing_params:
-                env_hints.append("KERNEL=<filename>")
-            if 'image' in missing_params:
-                env_hints.append("IMAGE=<filename>")
-            if 'rootfs-size' in missing_params:
-                env_hints.append("ROOTFS_SIZE=<size>")
-            if 'cpus' in missing_params:
-                env_hints.append("CPUS=<number>")
-            if 'memory' in missing_params:
-                env_hints.append("MEMORY=<mb>")
             
             if env_hints:
                 error_msg += f"\nNote: These can be set in config file: {', '.join(env_hints)}"
@@ -1,5 +1,7 @@
 #!/usr/bin/env python3
 
+import fcntl
+import os
 import shutil
 import subprocess
 import sys
@@ -7,6 +9,13 @@ from datetime import datetime
 from pathlib import Path
 from .config_manager import ConfigManager
 
+# ioctl that makes the destination share the source's extents (reflink), see ioctl_ficlone(2)
+_FICLONE = 0x40049409
+
+# Filename prefixes of kernel files and extensions of filesystem images shown by the listings
+_KERNEL_PREFIXES = ('vmlinux', 'bzImage', 'kernel', 'Image')
+_IMAGE_SUFFIXES = ('.ext4', '.ext3', '.ext2', '.img', '.qcow2', '.raw')
+
 
 class FilesystemManager:
     """Manages rootfs building, image/kernel listing and validation"""
@@ -14,9 +23,11 @@ class FilesystemManager:
     def __init__(self, config_manager=None):
         self.config_manager = config_manager or ConfigManager()
     
-    def _run_command(self, cmd, check=True, capture_output=True, text=True):
+    def _run_command(self, cmd, check=True, capture_output=True, text=True, discard_stdout=False):
         """Helper method to run subprocess commands with consistent error handling"""
         try:
+            if discard_stdout:
+                return subprocess.run(cmd, check=check, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=text)
             return subprocess.run(cmd, check=check, capture_output=capture_output, text=text)
         except subprocess.CalledProcessError as e:
             if capture_output:
@@ -26,6 +37,68 @@ class FilesystemManager:
             print(f"Unexpected error running command: {' '.join(cmd)}\nError: {e}", file=sys.stderr)
             raise
     
+    def _fast_copy(self, src, dst):
+        """Copy a file without moving its data through user space where possible
+        
+        Tries a reflink (FICLONE) first, which is near instant on btrfs/xfs and other
+        CoW filesystems, then an in-kernel os.copy_file_range() loop, and finally
+        falls back to shutil.copyfile(). File metadata is copied like shutil.copy2.
+        
+        Args:
+            src: Source file path
+            dst: Destination file path
+        """
+        src_fd = os.open(src, os.O_RDONLY)
+        try:
+            dst_fd = os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+            try:
+                try:
+                    fcntl.ioctl(dst_fd, _FICLONE, src_fd)
+                    copied = True
+                except OSError:
+                    copied = False
+                
+                if not copied:
+                    try:
+                        while os.copy_file_range(src_fd, dst_fd, 1 << 30):
+                            pass
+                        copied = True
+                    except OSError:
+                        copied = False
+            finally:
+                os.close(dst_fd)
+        finally:
+            os.close(src_fd)
+        
+        if not copied:
+            shutil.copyfile(src, dst)
+        shutil.copystat(src, dst)
+    
+    def _scan_directory(self, directory, prefixes=None, suffixes=None):
+        """List regular files in a directory whose names match, sorted by name
+        
+        Uses a single os.scandir() pass instead of one glob per pattern. Hidden
+        files are skipped, as glob does.
+        
+        Args:
+            directory: Directory to scan
+            prefixes: Tuple of accepted filename prefixes (None accepts any)
+            suffixes: Tuple of accepted filename suffixes (None accepts any)
+            
+        Returns:
+            list: os.DirEntry objects sorted by name
+        """
+        with os.scandir(directory) as it:
+            entries = [
+                entry for entry in it
+                if not entry.name.startswith('.')
+                and (prefixes is None or entry.name.startswith(prefixes))
+                and (suffixes is None or entry.name.endswith(suffixes))
+                and entry.is_file()
+            ]
+        entries.sort(key=lambda entry: entry.name)
+        return entries
+    
     def _validate_file_exists(self, file_path, file_type="file"):
         """Validate that a file exists and return Path object"""
         path = Path(file_path)
@@ -47,18 +120,20 @@ class FilesystemManager:
             return None
         
         kernel_dir = Path(kernel_path_env)
+        kernel_file = kernel_dir / kernel_filename
+        
+        # The common case is a kernel that exists, which a single stat confirms; the
+        # directory is only inspected to explain a miss
+        if kernel_file.exists():
+            return str(kernel_file)
         
         if not kernel_dir.is_dir():
             print(f"Error: KERNEL_PATH '{kernel_path_env}' is not a valid directory", file=sys.stderr)
             return None
         
-        kernel_file = kernel_dir / kernel_filename
-        if kernel_file.exists():
-            return str(kernel_file)
-        else:
-            print(f"Error: Kernel file '{kernel_filename}' not found in {kernel_dir}", file=sys.stderr)
-            print(f"Use './fcm kernels' to see available kernels")
-            return None
+        print(f"Error: Kernel file '{kernel_filename}' not found in {kernel_dir}", file=sys.stderr)
+        print(f"Use './fcm kernels' to see available kernels")
+        return None
     
     def build_rootfs(self, vm_name, image_filename, rootfs_size, force_overwrite=False):
         """Build rootfs by copying image file and resizing it"""
@@ -74,8 +149,15 @@ class FilesystemManager:
             return None
             
         images_dir = Path(images_path_env)
-        if not images_dir.is_dir():
-            print(f"Error: IMAGES_PATH '{images_path_env}' is not a valid directory", file=sys.stderr)
+        image_file = images_dir / image_filename
+        
+        # Stat the image itself first; the directory only matters when it is missing
+        if not image_file.exists():
+            if not images_dir.is_dir():
+                print(f"Error: IMAGES_PATH '{images_path_env}' is not a valid directory", file=sys.stderr)
+            else:
+                print(f"Error: Image file '{image_filename}' not found in {images_dir}", file=sys.stderr)
+                print(f"Use './fcm images' to see available images")
             return None
         
         # Validate ROOTFS_PATH
@@ -93,13 +175,6 @@ class FilesystemManager:
             print(f"Error creating rootfs directory {rootfs_dir}: {e}", file=sys.stderr)
             return None
         
-        # Check if image file exists
-        image_file = images_dir / image_filename
-        if not image_file.exists():
-            print(f"Error: Image file '{image_filename}' not found in {images_dir}", file=sys.stderr)
-            print(f"Use './fcm images' to see available images")
-            return None
-        
         # Define destination rootfs file
         rootfs_file = rootfs_dir / f"{vm_name}.ext4"
         
@@ -117,12 +192,12 @@ class FilesystemManager:
         try:
             # Copy image file to rootfs location
             print(f"Copying {image_file} -> {rootfs_file}")
-            shutil.copy2(image_file, rootfs_file)
+            self._fast_copy(image_file, rootfs_file)
             print(f"✓ Image copied to rootfs location")
             
             # Resize the rootfs file
             print(f"Resizing rootfs to {rootfs_size}")
-            self._run_command(["resize2fs", str(rootfs_file), rootfs_size])
+            self._run_command(["resize2fs", str(rootfs_file), rootfs_size], discard_stdout=True)
             print(f"✓ Rootfs resized to {rootfs_size}")
             
             print(f"✓ Rootfs built successfully: {rootfs_file}")
@@ -131,12 +206,11 @@ class FilesystemManager:
         except (subprocess.CalledProcessError, Exception) as e:
             print(f"Error building rootfs: {e}", file=sys.stderr)
             # Clean up partially created file
-            if rootfs_file.exists():
-                try:
-                    rootfs_file.unlink()
-                    print(f"✓ Cleaned up partial rootfs file: {rootfs_file}")
-                except Exception:
-                    pass
+            try:
+                os.unlink(rootfs_file)
+                print(f"✓ Cleaned up partial rootfs file: {rootfs_file}")
+            except Exception:
+                pass
             return None
     
     def prepare_filesystem(self, args):
@@ -186,19 +260,9 @@ class FilesystemManager:
             return None
             
         try:
-            # Look for common kernel file patterns
-            kernel_patterns = ['vmlinux*', 'bzImage*', 'kernel*', 'Image*']
-            kernel_files = []
-            
-            for pattern in kernel_patterns:
-                kernel_files.extend(kernel_dir.glob(pattern))
-            
-            # Remove duplicates and sort
-            kernel_files = sorted(set(kernel_files), key=lambda x: x.name)
-            
             # Build list of kernel data
             kernel_data = []
-            for kernel_file in kernel_files:
+            for kernel_file in self._scan_directory(kernel_dir, prefixes=_KERNEL_PREFIXES):
                 try:
                     stat = kernel_file.stat()
                     size_mb = stat.st_size / (1024 * 1024)
@@ -209,14 +273,14 @@ class FilesystemManager:
                         'filename': kernel_file.name,
                         'size': f"{size_mb:>6.1f} MB",
                         'modified': modified_str,
-                        'path': str(kernel_file)
+                        'path': kernel_file.path
                     })
                 except Exception:
                     kernel_data.append({
                         'filename': kernel_file.name,
                         'size': 'N/A',
                         'modified': 'N/A',
-                        'path': str(kernel_file)
+                        'path': kernel_file.path
                     })
             
             return kernel_data
@@ -245,19 +309,9 @@ class FilesystemManager:
             return None
             
         try:
-            # Look for common image file patterns
-            image_patterns = ['*.ext4', '*.ext3', '*.ext2', '*.img', '*.qcow2', '*.raw']
-            image_files = []
-            
-            for pattern in image_patterns:
-                image_files.extend(images_dir.glob(pattern))
-            
-            # Remove duplicates and sort
-            image_files = sorted(set(image_files), key=lambda x: x.name)
-            
             # Build list of image data
             image_data = []
-            for image_file in image_files:
+            for image_file in self._scan_directory(images_dir, suffixes=_IMAGE_SUFFIXES):
                 try:
                     stat = image_file.stat()
                     size_mb = stat.st_size / (1024 * 1024)
@@ -268,14 +322,14 @@ class FilesystemManager:
                         'filename': image_file.name,
                         'size': f"{size_mb:>6.1f} MB",
                         'modified': modified_str,
-                        'path': str(image_file)
+                        'path': image_file.path
                     })
                 except Exception:
                     image_data.append({
                         'filename': image_file.name,
                         'size': 'N/A',
                         'modified': 'N/A',
-                        'path': str(image_file)
+                        'path': image_file.path
                     })
             
             return image_data
@@ -329,15 +383,7 @@ class FilesystemManager:
             return False
             
         try:
-            # Look for common filesystem image patterns
-            image_patterns = ['*.ext4', '*.ext3', '*.ext2', '*.img', '*.qcow2', '*.raw']
-            image_files = []
-            
-            for pattern in image_patterns:
-                image_files.extend(images_dir.glob(pattern))
-            
-            # Remove duplicates and sort
-            image_files = sorted(set(image_files), key=lambda x: x.name)
+            image_files = self._scan_directory(images_dir, suffixes=_IMAGE_SUFFIXES)
             
             if not image_files:
                 print(f"No image files found in {images_dir}")
@@ -355,7 +401,7 @@ class FilesystemManager:
                 try:
                     stat = image_file.stat()
                     size_mb = stat.st_size / (1024 * 1024)
-                    modified = Path(image_file).stat().st_mtime
+                    modified = stat.st_mtime
                     modified_str = datetime.fromtimestamp(modified).strftime('%Y-%m-%d %H:%M')
                     
                     print(f"{image_file.name:<30} {size_mb:>6.1f} MB {modified_str}")
@@ -1,90 +1,379 @@
 #!/usr/bin/env python3
 
-import requests
-import requests_unixsocket
+import functools
+import io
+import json
+import os
+import socket
 import sys
-from pathlib import Path
+from contextlib import contextmanager
+
+
+# Request headers, built once. Host and Content-Length are added by http.client.
+_HEADERS = {"Accept": "application/json"}
+_JSON_HEADERS = {"Accept": "application/json", "Content-Type": "application/json"}
+
+# Raw header blocks for pipelined requests, which bypass http.client's request state
+_RAW_HEADERS = b"Host: localhost\r\nAccept: application/json\r\n"
+_RAW_JSON_HEADERS = _RAW_HEADERS + b"Content-Type: application/json\r\n"
+
+
+def _encode_json(data):
+    """Serialize a request body once into compact JSON bytes"""
+    return json.dumps(data, separators=(",", ":")).encode()
+
+
+# Body of the InstanceStart action, which never changes
+_INSTANCE_START_BODY = _encode_json({"action_type": "InstanceStart"})
+
+
+@functools.lru_cache(maxsize=None)
+def _connection_class():
+    """Build the HTTP connection class for Unix sockets on first use
+    
+    http.client is only imported here, so actions that never talk to the
+    Firecracker API don't pay for it.
+    """
+    import http.client
+
+    class UnixHTTPConnection(http.client.HTTPConnection):
+        def __init__(self, socket_path):
+            super().__init__("localhost")
+            self.socket_path = socket_path
+
+        def connect(self):
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.connect(self.socket_path)
+
+    return UnixHTTPConnection
+
+
+def _encode_request(method, endpoint, body):
+    """Encode one HTTP/1.1 request for a pipelined send"""
+    if body is None:
+        return b"%s %s HTTP/1.1\r\n%s\r\n" % (method.encode(), endpoint.encode(), _RAW_HEADERS)
+    return b"%s %s HTTP/1.1\r\n%sContent-Length: %d\r\n\r\n%s" % (
+        method.encode(), endpoint.encode(), _RAW_JSON_HEADERS, len(body), body)
+
+
+class _SharedReader(io.BufferedReader):
+    """Buffered socket reader shared by all responses of one pipelined send
+    
+    Bytes of later responses may already sit in the buffer when an earlier one
+    is parsed, so every http.client.HTTPResponse must read from the same
+    reader, and finishing one response must not close it.
+    """
+    
+    def close(self):
+        pass
+    
+    def makefile(self, mode):
+        # Lets the reader stand in for the socket passed to HTTPResponse
+        return self
 
 
 class FirecrackerAPI:
     """Core Firecracker API client for HTTP requests and configuration"""
     
+    __slots__ = ("socket_path", "_conn", "_batch", "_vm_config", "_mmds_data")
+    
     def __init__(self, socket_path):
         self.socket_path = socket_path
-        self.session = requests_unixsocket.Session()
-        self.base_url = f"http+unix://{self.socket_path.replace('/', '%2F')}"
+        self._conn = None  # Opened lazily and kept alive across requests
+        self._batch = None  # Queued PUT requests while a batch is open
+        self._vm_config = None  # Last /vm/config response, dropped on any PUT
+        self._mmds_data = None  # Last /mmds response, dropped on any PUT
+    
+    def close(self):
+        """Close the connection to the Firecracker API socket"""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+    
+    def _exchange(self, method, endpoint, body):
+        """Send one request over the kept-alive connection and read its response
+        
+        Args:
+            method: HTTP method
+            endpoint: API endpoint path
+            body: Pre-encoded JSON body as bytes (None for no body)
+        
+        Returns:
+            tuple: (status code, raw response body)
+        """
+        if self._conn is None:
+            self._conn = _connection_class()(self.socket_path)
+        try:
+            headers = _HEADERS if body is None else _JSON_HEADERS
+            self._conn.request(method, endpoint, body=body, headers=headers)
+            response = self._conn.getresponse()
+            return response.status, response.read()
+        except Exception:
+            # Never reuse a connection left in an unknown state
+            self.close()
+            raise
+    
+    def _request(self, method, endpoint, body=None):
+        """Send request to Firecracker API
+        
+        A kept-alive connection may have gone stale in the meantime (e.g. Firecracker
+        was restarted), so a request that fails on a reused connection is sent once
+        more on a fresh one. Failures on a fresh connection are not retried.
+        
+        Args:
+            method: HTTP method
+            endpoint: API endpoint path
+            body: Pre-encoded JSON body as bytes (None for no body)
+        
+        Returns:
+            tuple: (status code, raw response body)
+        """
+        reused = self._conn is not None and self._conn.sock is not None
+        try:
+            return self._exchange(method, endpoint, body)
+        except (BrokenPipeError, ConnectionResetError):
+            if not reused:
+                raise
+            return self._exchange(method, endpoint, body)
+    
+    def _send_pipelined(self, requests, responses):
+        """Write all requests with one sendall() and read their responses in order
+        
+        Args:
+            requests: List of (method, endpoint, pre-encoded body or None) tuples
+            responses: List the (status code, raw response body) tuples are appended to
+        """
+        import http.client
+        
+        if self._conn is None:
+            self._conn = _connection_class()(self.socket_path)
+        try:
+            if self._conn.sock is None:
+                self._conn.connect()
+            sock = self._conn.sock
+            sock.sendall(b"".join(_encode_request(*request) for request in requests))
+            
+            reader = _SharedReader(socket.SocketIO(sock, "rb"))
+            will_close = False
+            for method, _endpoint, _body in requests:
+                response = http.client.HTTPResponse(reader, method=method)
+                response.begin()
+                responses.append((response.status, response.read()))
+                will_close = response.will_close
+            if will_close:
+                self.close()
+        except Exception:
+            # Never reuse a connection left in an unknown state
+            self.close()
+            raise
+    
+    def _pipeline(self, requests):
+        """Send several requests back to back over the kept-alive connection
+        
+        All requests are written at once and the responses are read afterwards, so
+        a batch costs one write instead of one round trip per request. As in
+        _request(), a stale reused connection is replaced once, but only if no
+        response has been read yet.
+        
+        Args:
+            requests: List of (method, endpoint, pre-encoded body or None) tuples
+        
+        Returns:
+            list: (status code, raw response body) tuples in request order
+        """
+        reused = self._conn is not None and self._conn.sock is not None
+        responses = []
+        try:
+            self._send_pipelined(requests, responses)
+        except (BrokenPipeError, ConnectionResetError):
+            if not reused or responses:
+                raise
+            self._send_pipelined(requests, responses)
+        return responses
+    
+    @contextmanager
+    def batch(self):
+        """Queue PUT requests made inside the block instead of sending them one by one
+        
+        Queued requests are pipelined over the kept-alive connection by flush_batch().
+        Requests still queued when the block exits are discarded.
+        """
+        self._batch = []
+        try:
+            yield
+        finally:
+            self._batch = None
+    
+    def flush_batch(self):
+        """Pipeline all queued requests and check their responses
+        
+        Returns:
+            bool: True if every queued request succeeded, False otherwise
+        """
+        requests, self._batch = self._batch, []
+        if not requests:
+            return True
+        
+        try:
+            responses = self._pipeline(requests)
+        except Exception as e:
+            print(f"Request failed: {e}", file=sys.stderr)
+            return False
+        
+        success = True
+        for (method, endpoint, _), (status, body) in zip(requests, responses):
+            if status not in [200, 204]:
+                print(f"Error: {method} {endpoint}: {status} - {body.decode(errors='replace')}", file=sys.stderr)
+                success = False
+        return success
     
     def _make_request(self, method, endpoint, data=None):
-        """Make HTTP request to Firecracker API"""
-        url = f"{self.base_url}{endpoint}"
+        """Make HTTP request to Firecracker API (queued instead if a batch is open)
+        
+        Args:
+            method: HTTP method
+            endpoint: API endpoint path
+            data: Request body as a JSON-serializable object or pre-encoded bytes
+        """
         try:
-            if method == "PUT":
-                response = self.session.put(url, json=data)
-            elif method == "GET":
-                response = self.session.get(url)
-            else:
+            if method not in ("PUT", "GET"):
                 raise ValueError(f"Unsupported HTTP method: {method}")
             
-            if response.status_code not in [200, 204]:
-                print(f"Error: {response.status_code} - {response.text}", file=sys.stderr)
+            # Serialize once; queued requests keep the encoded bytes
+            if data is not None and not isinstance(data, bytes):
+                data = _encode_json(data)
+            
+            if method == "PUT":
+                # Configuration is changing, cached GET responses are no longer valid
+                self._vm_config = None
+                self._mmds_data = None
+            
+            if self._batch is not None and method == "PUT":
+                self._batch.append((method, endpoint, data))
+                return True
+            
+            status, body = self._request(method, endpoint, data)
+            
+            if status not in [200, 204]:
+                print(f"Error: {status} - {body.decode(errors='replace')}", file=sys.stderr)
                 return False
             return True
         except Exception as e:
             print(f"Request failed: {e}", file=sys.stderr)
             return False
     
-    def check_socket_in_use(self):
-        """Check if Firecracker process is listening on socket"""
+    def check_socket_in_use(self, remove_stale=False):
+        """Check if Firecracker process is listening on socket
+        
+        A single connect() tells both whether the socket file exists and whether
+        anything is listening on it.
+        
+        Args:
+            remove_stale: Delete the socket file if nothing is listening on it
+        """
         try:
-            response = self.session.get(f"{self.base_url}/")
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(0.1)
+                sock.connect(self.socket_path)
             return True  # Socket is in use
-        except:
-            return False  # Socket is not in use or doesn't exist
+        except (TimeoutError, BlockingIOError):
+            return True  # Listener exists but its backlog is full
+        except ConnectionRefusedError:
+            # Socket file exists but nothing is listening
+            if remove_stale:
+                print(f"Removing stale socket file: {self.socket_path}")
+                try:
+                    os.unlink(self.socket_path)
+                except FileNotFoundError:
+                    pass
+            return False
+        except OSError:
+            return False  # Socket doesn't exist or is not a usable socket
     
     def get_vm_config(self):
-        """Get VM configuration from Firecracker API"""
+        """Get VM configuration from Firecracker API
+        
+        Also serves as a liveness check: None is returned if nothing is listening on
+        the socket. The response is reused until the next PUT on this client.
+        """
+        if self._vm_config is not None:
+            return self._vm_config
         try:
-            response = self.session.get(f"{self.base_url}/vm/config")
-            if response.status_code == 200:
-                return response.json()
+            status, body = self._request("GET", "/vm/config")
+            if status == 200:
+                self._vm_config = json.loads(body)
+                return self._vm_config
             else:
                 return None
         except Exception:
             return None
     
     def get_mmds_data(self):
-        """Get MMDS data from Firecracker API"""
+        """Get MMDS data from Firecracker API (reused until the next PUT on this client)"""
+        if self._mmds_data is not None:
+            return self._mmds_data
         try:
-            response = self.session.get(f"{self.base_url}/mmds")
-            if response.status_code == 200:
-                return response.json()
+            status, body = self._request("GET", "/mmds")
+            if status == 200:
+                self._mmds_data = json.loads(body)
+                return self._mmds_data
         except Exception:
             pass
         return None
     
+    def get_vm_state(self):
+        """Get VM configuration and MMDS data with both GETs pipelined
+        
+        If one of them is still cached, only the other one is requested.
+        
+        Returns:
+            tuple: (VM configuration, MMDS data); the configuration is None if the VM
+                   is not running, the MMDS data is None if not available
+        """
+        if self._vm_config is not None or self._mmds_data is not None:
+            vm_config = self.get_vm_config()
+            if not vm_config:
+                return None, None
+            return vm_config, self.get_mmds_data()
+        
+        try:
+            (config_status, config_body), (mmds_status, mmds_body) = self._pipeline(
+                [("GET", "/vm/config", None), ("GET", "/mmds", None)])
+            if config_status != 200:
+                return None, None
+            self._vm_config = json.loads(config_body)
+        except Exception:
+            return None, None
+        try:
+            if mmds_status == 200:
+                self._mmds_data = json.loads(mmds_body)
+        except ValueError:
+            pass
+        return self._vm_config, self._mmds_data
+    
     def set_boot_source(self, kernel_path, boot_args="console=ttyS0 reboot=k panic=1 pci=off"):
         """Set the boot source for the VM"""
-        kernel_file = Path(kernel_path)
-        if not kernel_file.exists():
+        kernel_file = os.path.abspath(kernel_path)
+        if not os.path.exists(kernel_file):
             print(f"Error: Kernel file {kernel_path} does not exist", file=sys.stderr)
             return False
         
         data = {
-            "kernel_image_path": str(kernel_file.absolute()),
+            "kernel_image_path": kernel_file,
             "boot_args": boot_args
         }
         return self._make_request("PUT", "/boot-source", data)
     
     def set_rootfs(self, rootfs_path):
         """Set the root filesystem drive"""
-        rootfs_file = Path(rootfs_path)
-        if not rootfs_file.exists():
+        rootfs_file = os.path.abspath(rootfs_path)
+        if not os.path.exists(rootfs_file):
             print(f"Error: Rootfs file {rootfs_path} does not exist", file=sys.stderr)
             return False
         
         data = {
             "drive_id": "rootfs",
-            "path_on_host": str(rootfs_file.absolute()),
+            "path_on_host": rootfs_file,
             "is_root_device": True,
             "is_read_only": False
         }
@@ -115,7 +404,10 @@ class FirecrackerAPI:
         return self._make_request("PUT", "/mmds/config", data)
     
     def set_mmds_metadata(self, metadata):
-        """Set metadata for the Metadata Service (MMDS)"""
+        """Set metadata for the Metadata Service (MMDS)
+        
+        The whole document is sent as one application/json PUT.
+        """
         if not metadata:
             return True  # Skip if no metadata provided
         
@@ -123,7 +415,4 @@ class FirecrackerAPI:
     
     def start_microvm(self):
         """Start the microVM"""
-        data = {
-            "action_type": "InstanceStart"
-        }
-        return self._make_request("PUT", "/actions", data)
\ No newline at end of file
+        return self._make_request("PUT", "/actions", _INSTANCE_START_BODY)
\ No newline at end of file
@@ -1,7 +1,42 @@
 #!/usr/bin/env python3
 
+import json
+import os
+import re
+import socket
 import subprocess
 import sys
+import time
+
+# Already running as root: call privileged commands directly instead of forking sudo.
+# Shared by every module that runs privileged commands.
+SKIP_SUDO = os.geteuid() == 0
+
+# How long a discovered TAP device list is reused (seconds)
+_TAP_CACHE_TTL = 0.5
+
+# Device name and non-loopback IPv4 address of an `ip -o -4 addr show` line
+# ("4: tap0    inet 172.16.0.1/24 scope global tap0\ ...")
+_INET_LINE_RE = re.compile(rb'^\d+: (\S+)\s+inet (?!127\.)(\d+\.\d+\.\d+\.\d+)/', re.MULTILINE)
+
+
+def _host_route_exists(ip):
+    """Check whether the main routing table has a /32 route for an IPv4 address
+    
+    /proc/net/route lists the main table like `ip route show`, without running a process.
+    Destination and mask are the raw 32-bit values in hex, in host byte order.
+    """
+    destination = f"{int.from_bytes(socket.inet_aton(ip), sys.byteorder):08X}"
+    try:
+        with open("/proc/net/route") as f:
+            next(f, None)  # Header line
+            for line in f:
+                fields = line.split()
+                if len(fields) > 7 and fields[1] == destination and fields[7] == "FFFFFFFF":
+                    return True
+    except OSError:
+        pass
+    return False
 
 
 class NetworkManager:
@@ -9,11 +44,24 @@ class NetworkManager:
     
     def __init__(self):
         self.allocated_tap_devices = set()  # Track devices allocated in this session
+        self._tap_cache = None  # Last discover_existing_tap_devices() result
+        self._tap_cache_ts = 0
+        self._used_tap_indices = {}  # prefix -> indices in use, seeded once per prefix
+        self._next_tap_hint = {}  # prefix -> lowest index that may still be free
+        self._device_exists = {}  # Device name -> whether it exists, kept current by _run_batch
     
-    def _run_command(self, cmd, check=True, capture_output=True, text=True):
-        """Helper method to run subprocess commands with consistent error handling"""
+    def _run_command(self, cmd, check=True, capture_output=True, text=True, input=None, discard_stdout=False):
+        """Helper method to run subprocess commands with consistent error handling
+        
+        With discard_stdout=True stdout goes to /dev/null and only stderr is captured,
+        for commands whose output is never looked at.
+        """
+        if SKIP_SUDO and cmd[0] == "sudo":
+            cmd = cmd[1:]
         try:
-            return subprocess.run(cmd, check=check, capture_output=capture_output, text=text)
+            if discard_stdout:
+                return subprocess.run(cmd, check=check, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=text, input=input)
+            return subprocess.run(cmd, check=check, capture_output=capture_output, text=text, input=input)
         except subprocess.CalledProcessError as e:
             if capture_output:
                 print(f"Command failed: {' '.join(cmd)}\nError: {e}", file=sys.stderr)
@@ -24,76 +72,129 @@ class NetworkManager:
     
     def _setup_device_common(self, device_name):
         """Common device setup logic - check if device exists"""
-        result = self._run_command(["ip", "link", "show", device_name], check=False)
-        return result.returncode == 0  # True if device exists
+        exists = self._device_exists.get(device_name)
+        if exists is None:
+            # Every network device has an entry in sysfs, so no `ip link show` process is needed
+            exists = os.path.exists(f"/sys/class/net/{device_name}")
+            self._device_exists[device_name] = exists
+        return exists
     
-    def _create_tap_device(self, device_name):
-        """Create a TAP device"""
-        print(f"Creating {device_name}")
-        self._run_command(["sudo", "ip", "tuntap", "add", device_name, "mode", "tap"])
-        print(f"✓ {device_name} created")
+    def _run_batch(self, commands, force=False):
+        """Run several ip commands through a single privileged `ip -batch` invocation
+        
+        Args:
+            commands: List of ip commands without the leading "ip" (e.g. "link set tap0 up")
+            force: Keep going after a failed command (`ip -force`) and return the result
+                   instead of raising; the caller checks what was applied
+        """
+        if not commands:
+            return None
+        # Devices are about to change, don't serve a stale TAP list afterwards
+        self._tap_cache = None
+        self._device_exists.clear()
+        cmd = ["sudo", "ip", "-force", "-batch", "-"] if force else ["sudo", "ip", "-batch", "-"]
+        result = self._run_command(cmd, check=not force, input="\n".join(commands) + "\n", discard_stdout=True)
+        if result.returncode != 0:
+            return result  # Some commands failed, device existence has to be probed again
+        
+        # The batch succeeded, so devices it created or deleted are known without probing
+        for command in commands:
+            words = command.split()
+            if words[:2] == ["tuntap", "add"]:
+                self._device_exists[words[2]] = True
+            elif words[:2] == ["link", "del"]:
+                self._device_exists[words[2]] = False
+        return result
     
-    def _bring_device_up(self, device_name):
-        """Bring a network device up"""
-        print(f"Bringing up {device_name}")
-        self._run_command(["sudo", "ip", "link", "set", device_name, "up"])
-        print(f"✓ {device_name} is up")
+    def _get_network_state(self):
+        """Read links, addresses and routes with a single `ip -json -batch` call
+        
+        Returns:
+            dict: Network state with:
+                - links: set of existing device names
+                - addresses: device name -> set of "ip/prefixlen" addresses
+                - routes: destination ("ip/prefixlen") -> set of device names
+        """
+        result = self._run_command(["ip", "-json", "-batch", "-"], input="addr show\nroute show\n")
+        
+        # ip prints one JSON array per batch command
+        decoder = json.JSONDecoder()
+        output = result.stdout
+        sections = []
+        pos = 0
+        while len(sections) < 2:
+            while pos < len(output) and output[pos].isspace():
+                pos += 1
+            section, pos = decoder.raw_decode(output, pos)
+            sections.append(section)
+        addr_section, route_section = sections
+        
+        state = {'links': set(), 'addresses': {}, 'routes': {}}
+        for link in addr_section:
+            ifname = link['ifname']
+            state['links'].add(ifname)
+            state['addresses'][ifname] = {
+                f"{addr_info['local']}/{addr_info['prefixlen']}" for addr_info in link.get('addr_info', [])
+            }
+        for route in route_section:
+            dst = route.get('dst', '')
+            # Host routes are printed without their /32 prefix length
+            if dst != 'default' and '/' not in dst:
+                dst = f"{dst}/32"
+            state['routes'].setdefault(dst, set()).add(route.get('dev'))
+        
+        return state
     
     def discover_existing_tap_devices(self):
-        """Discover existing TAP devices on the system"""
+        """Discover existing TAP devices on the system
+        
+        Every network device has an entry in /sys/class/net, so one directory listing
+        replaces running `ip link show`. The result is reused for a short time so
+        allocating and validating several devices in one pass lists it only once.
+        Session allocations are tracked separately in allocated_tap_devices, and the
+        cache is dropped whenever devices are changed.
+        
+        Returns:
+            frozenset: Names of existing devices starting with "tap"
+        """
+        if self._tap_cache is not None and time.monotonic() - self._tap_cache_ts < _TAP_CACHE_TTL:
+            return self._tap_cache
+        
         try:
-            result = self._run_command(["ip", "link", "show"])
-            
-            # Parse output to find tap devices (format: "1: tap0: <BROADCAST,MULTICAST> ...")
-            tap_devices = []
-            for line in result.stdout.split('\n'):
-                if 'tap' in line and ':' in line:
-                    # Extract device name between first and second colon
-                    parts = line.split(':')
-                    if len(parts) >= 2:
-                        device_name = parts[1].strip()
-                        if device_name.startswith('tap') and device_name not in tap_devices:
-                            tap_devices.append(device_name)
-            
-            return tap_devices
-            
-        except (subprocess.CalledProcessError, Exception) as e:
+            tap_devices = frozenset(name for name in os.listdir("/sys/class/net") if name.startswith("tap"))
+        except OSError as e:
             print(f"Warning: Could not discover TAP devices: {e}", file=sys.stderr)
-            return []
+            return frozenset()
+        
+        self._tap_cache = tap_devices
+        self._tap_cache_ts = time.monotonic()
+        return tap_devices
     
     def find_next_available_tap_device(self, prefix="tap"):
-        """Find next available tap device name (tap0, tap1, etc.)"""
-        existing_devices = self.discover_existing_tap_devices()
+        """Find next available tap device name (tap0, tap1, etc.)
+        
+        Existing devices are scanned once per prefix; later calls continue from the
+        last allocated index, so allocating several devices in a row stays linear.
+        """
+        used_indices = self._used_tap_indices.get(prefix)
+        if used_indices is None:
+            # Extract indices from existing tap devices (system + session allocated)
+            used_indices = set()
+            for device in (*self.discover_existing_tap_devices(), *self.allocated_tap_devices):
+                # Extract number after prefix (e.g., "tap0" -> 0)
+                index_str = device[len(prefix):]
+                if device.startswith(prefix) and index_str.isdigit():
+                    used_indices.add(int(index_str))
+            self._used_tap_indices[prefix] = used_indices
         
-        # Extract indices from existing tap devices (system + session allocated)
-        used_indices = set()
-        
-        # Add system devices
-        for device in existing_devices:
-            if device.startswith(prefix):
-                try:
-                    # Extract number after prefix (e.g., "tap0" -> 0)
-                    index_str = device[len(prefix):]
-                    if index_str.isdigit():
-                        used_indices.add(int(index_str))
-                except ValueError:
-                    continue
-        
-        # Add session-allocated devices
-        for device in self.allocated_tap_devices:
-            if device.startswith(prefix):
-                try:
-                    index_str = device[len(prefix):]
-                    if index_str.isdigit():
-                        used_indices.add(int(index_str))
-                except ValueError:
-                    continue
-        
-        # Find first available index starting from 0
-        index = 0
-        while index in used_indices:
+        # Find first available index, also skipping names allocated explicitly since seeding
+        index = self._next_tap_hint.get(prefix, 0)
+        while index in used_indices or f"{prefix}{index}" in self.allocated_tap_devices:
             index += 1
         
+        used_indices.add(index)
+        self._next_tap_hint[prefix] = index + 1
+        
         device_name = f"{prefix}{index}"
         # Track this device as allocated
         self.allocated_tap_devices.add(device_name)
@@ -169,31 +270,148 @@ class NetworkManager:
             
             return args.tap_device, args.mmds_tap
     
-    def get_tap_device_ip(self, device_name):
-        """Get IP address of a TAP device from the system"""
+    def get_device_ips(self, device_name=None):
+        """Get the IPv4 address of every device (or one device) with a single `ip` call
+        
+        Args:
+            device_name: Only query this device (default: all devices)
+            
+        Returns:
+            dict: Device name -> first non-loopback IPv4 address (without prefix length)
+        """
+        cmd = ["ip", "-o", "-4", "addr", "show"]
+        if device_name:
+            cmd += ["dev", device_name]
+        
+        try:
+            # One address per line, so a single regex scan over the raw bytes finds them all
+            result = self._run_command(cmd, text=False)
+            device_ips = {}
+            for name, ip_addr in _INET_LINE_RE.findall(result.stdout):
+                device_ips.setdefault(name.decode(), ip_addr.decode())
+            return device_ips
+            
+        except (subprocess.CalledProcessError, Exception):
+            return {}
+    
+    def get_tap_device_ip(self, device_name, device_ips=None):
+        """Get IP address of a TAP device from the system
+        
+        Args:
+            device_name: TAP device name
+            device_ips: Result of get_device_ips() to look the device up in; when
+                        checking many devices, fetch it once and pass it in
+        """
         if not device_name or device_name == 'N/A':
             return 'N/A'
         
+        if device_ips is None:
+            device_ips = self.get_device_ips(device_name)
+        return device_ips.get(device_name, 'N/A')
+    
+    def _mmds_tap_commands(self, mmds_tap):
+        """Build the ip commands that create and bring up the MMDS TAP device
+        
+        Args:
+            mmds_tap: MMDS TAP device name
+            
+        Returns:
+            list: ip commands for _run_batch
+        """
+        commands = []
+        
+        if not self._setup_device_common(mmds_tap):
+            # MMDS TAP device doesn't exist, create it
+            print(f"Creating {mmds_tap}")
+            commands.append(f"tuntap add {mmds_tap} mode tap")
+        else:
+            print(f"✓ MMDS TAP device {mmds_tap} already exists")
+        
+        # Bring MMDS TAP device up
+        print(f"Bringing up {mmds_tap}")
+        commands.append(f"link set {mmds_tap} up")
+        
+        return commands
+    
+    def _tap_device_commands(self, tap_device, tap_ip, vm_ip):
+        """Build the ip commands that create, address, bring up and route the TAP device
+        
+        The address uses `replace`, which succeeds whether or not it is already set.
+        The host route is only added if the VM IP has none yet; an existing route may
+        belong to another VM or the operator and is left untouched.
+        
+        Args:
+            tap_device: TAP device name
+            tap_ip: IP address for the TAP device
+            vm_ip: IP address of the VM
+            
+        Returns:
+            list: ip commands for _run_batch
+        """
+        commands = []
+        
+        if not self._setup_device_common(tap_device):
+            # TAP device doesn't exist, create it
+            print(f"Creating {tap_device}")
+            commands.append(f"tuntap add {tap_device} mode tap")
+        else:
+            print(f"✓ TAP device {tap_device} already exists")
+        
+        # Configure IP address on TAP device
+        print(f"Configuring IP {tap_ip}/32 on {tap_device}")
+        commands.append(f"addr replace {tap_ip}/32 dev {tap_device}")
+        
+        # Bring TAP device up (must happen before the route can be added)
+        print(f"Bringing up {tap_device}")
+        commands.append(f"link set {tap_device} up")
+        
+        # Add route for VM IP via TAP device unless one already exists
+        if _host_route_exists(vm_ip):
+            print(f"✓ Route for {vm_ip} already exists")
+        else:
+            print(f"Adding route for VM IP {vm_ip} via {tap_device}")
+            commands.append(f"route add {vm_ip}/32 dev {tap_device}")
+        
+        return commands
+    
+    def setup_vm_network(self, tap_device, tap_ip, vm_ip, mmds_tap=None, networkdriver="internal"):
+        """Create and configure the TAP device and, optionally, the MMDS TAP device in one transaction
+        
+        Device existence is read from sysfs and everything for both devices is
+        applied with a single `ip -batch` invocation.
+        
+        Args:
+            tap_device: TAP device name
+            tap_ip: IP address for the TAP device
+            vm_ip: IP address of the VM
+            mmds_tap: MMDS TAP device name (None to skip MMDS setup)
+            networkdriver: Network driver mode ("internal" or "external")
+            
+        Returns:
+            bool: True if setup succeeded
+        """
+        if networkdriver == "external":
+            print(f"✓ External network mode: Skipping TAP device setup for {tap_device}")
+            if mmds_tap:
+                print(f"✓ External network mode: Skipping MMDS TAP device setup for {mmds_tap}")
+            return True
+            
         try:
-            result = self._run_command(["ip", "addr", "show", device_name])
+            commands = self._tap_device_commands(tap_device, tap_ip, vm_ip)
+            if mmds_tap:
+                commands += self._mmds_tap_commands(mmds_tap)
             
-            # Parse output to find IPv4 address
-            for line in result.stdout.split('\n'):
-                line = line.strip()
-                if 'inet ' in line and not line.startswith('inet 127.'):
-                    # Extract IP address (format: "inet 192.168.1.1/32 scope global tap0")
-                    parts = line.split()
-                    for i, part in enumerate(parts):
-                        if part == 'inet' and i + 1 < len(parts):
-                            ip_with_mask = parts[i + 1]
-                            # Remove subnet mask if present
-                            ip_addr = ip_with_mask.split('/')[0]
-                            return ip_addr
+            # Apply all changes with a single ip invocation
+            self._run_batch(commands)
+            print(f"✓ TAP device {tap_device} configured and up")
+            if mmds_tap:
+                print(f"✓ {mmds_tap} is up")
             
-            return 'N/A'
+            return True
             
-        except (subprocess.CalledProcessError, Exception):
-            return 'N/A'
+        except (subprocess.CalledProcessError, Exception) as e:
+            print(f"Error setting up TAP devices: {e}", file=sys.stderr)
+            return False
     
     def setup_mmds_tap_device(self, mmds_tap, networkdriver="internal"):
         """Create MMDS TAP device on host (no IP configuration needed)"""
@@ -202,15 +420,8 @@ class NetworkManager:
             return True
             
         try:
-            # Check if MMDS TAP device already exists
-            if not self._setup_device_common(mmds_tap):
-                # MMDS TAP device doesn't exist, create it
-                self._create_tap_device(mmds_tap)
-            else:
-                print(f"✓ MMDS TAP device {mmds_tap} already exists")
-            
-            # Bring MMDS TAP device up
-            self._bring_device_up(mmds_tap)
+            self._run_batch(self._mmds_tap_commands(mmds_tap))
+            print(f"✓ {mmds_tap} is up")
             
             return True
             
@@ -225,37 +436,8 @@ class NetworkManager:
             return True
             
         try:
-            # Check if TAP device already exists
-            if not self._setup_device_common(tap_device):
-                # TAP device doesn't exist, create it
-                self._create_tap_device(tap_device)
-            else:
-                print(f"✓ TAP device {tap_device} already exists")
-            
-            # Check if IP address is already configured
-            addr_result = self._run_command(["ip", "addr", "show", tap_device])
-            
-            if f"{tap_ip}/32" not in addr_result.stdout:
-                # Configure IP address on TAP device
-                print(f"Configuring IP {tap_ip}/32 on {tap_device}")
-                self._run_command(["sudo", "ip", "addr", "add", f"{tap_ip}/32", "dev", tap_device])
-                print(f"✓ IP {tap_ip}/32 configured on {tap_device}")
-            else:
-                print(f"✓ IP {tap_ip}/32 already configured on {tap_device}")
-            
-            # Bring TAP device up
-            self._bring_device_up(tap_device)
-            
-            # Check if route already exists
-            route_result = self._run_command(["ip", "route", "show", f"{vm_ip}/32"])
-            
-            if not route_result.stdout.strip():
-                # Add route for VM IP via TAP device
-                print(f"Adding route for VM IP {vm_ip} via {tap_device}")
-                self._run_command(["sudo", "ip", "route", "add", f"{vm_ip}/32", "dev", tap_device])
-                print(f"✓ Route for {vm_ip} via {tap_device} added")
-            else:
-                print(f"✓ Route for {vm_ip} already exists")
+            self._run_batch(self._tap_device_commands(tap_device, tap_ip, vm_ip))
+            print(f"✓ TAP device {tap_device} configured and up")
             
             return True
             
@@ -263,68 +445,99 @@ class NetworkManager:
             print(f"Error setting up TAP device: {e}", file=sys.stderr)
             return False
     
-    def remove_tap_device(self, tap_device, networkdriver="internal"):
-        """Remove TAP device (routes are automatically removed)"""
+    def remove_tap_devices(self, tap_devices, networkdriver="internal"):
+        """Remove several TAP devices with a single `ip -batch` call (routes are automatically removed)
+        
+        The batch runs with `ip -force`, so a device that fails to be removed (e.g. one
+        that vanished in the meantime) doesn't keep the others from being removed.
+        
+        Args:
+            tap_devices: TAP device names to remove
+            networkdriver: Network driver mode ("internal" or "external")
+            
+        Returns:
+            bool: True if every existing device was removed
+        """
         if networkdriver == "external":
-            print(f"✓ External network mode: Skipping TAP device removal for {tap_device}")
+            for tap_device in tap_devices:
+                print(f"✓ External network mode: Skipping TAP device removal for {tap_device}")
             return True
             
         try:
-            # Check if TAP device exists
-            if self._setup_device_common(tap_device):
-                print(f"Removing TAP device: {tap_device}")
-                self._run_command(["sudo", "ip", "link", "del", tap_device])
-                print(f"✓ TAP device {tap_device} removed (routes automatically removed)")
-            else:
-                print(f"✓ TAP device {tap_device} doesn't exist")
+            # Check which TAP devices exist
+            existing = []
+            for tap_device in tap_devices:
+                if self._setup_device_common(tap_device):
+                    print(f"Removing TAP device: {tap_device}")
+                    existing.append(tap_device)
+                else:
+                    print(f"✓ TAP device {tap_device} doesn't exist")
             
-            return True
+            result = self._run_batch([f"link del {tap_device}" for tap_device in existing], force=True)
+            
+            # After a partial failure, sysfs tells which devices are actually gone
+            success = True
+            for tap_device in existing:
+                if result.returncode == 0 or not self._setup_device_common(tap_device):
+                    print(f"✓ TAP device {tap_device} removed (routes automatically removed)")
+                else:
+                    print(f"Error removing TAP device {tap_device}: {result.stderr.strip()}", file=sys.stderr)
+                    success = False
+            
+            return success
             
         except (subprocess.CalledProcessError, Exception) as e:
             print(f"Error removing TAP device: {e}", file=sys.stderr)
             return False
     
+    def remove_tap_device(self, tap_device, networkdriver="internal"):
+        """Remove TAP device (routes are automatically removed)"""
+        return self.remove_tap_devices([tap_device], networkdriver)
+    
     def validate_external_network_setup(self, tap_device, tap_ip, mmds_tap, vm_ip):
         """Validate external network setup - check if TAP devices exist, IPs assigned, routes exist"""
         print(f"Validating external network setup...")
         
+        # Read links, addresses and routes once for all checks
+        try:
+            state = self._get_network_state()
+        except (subprocess.CalledProcessError, Exception) as e:
+            print(f"Error reading network configuration: {e}", file=sys.stderr)
+            return False
+        
         # Check if main TAP device exists
-        if not self._setup_device_common(tap_device):
+        if tap_device not in state['links']:
             print(f"Error: TAP device '{tap_device}' does not exist", file=sys.stderr)
             return False
         print(f"✓ TAP device '{tap_device}' exists")
         
         # Check if MMDS TAP device exists
-        if not self._setup_device_common(mmds_tap):
+        if mmds_tap not in state['links']:
             print(f"Error: MMDS TAP device '{mmds_tap}' does not exist", file=sys.stderr)
             return False
         print(f"✓ MMDS TAP device '{mmds_tap}' exists")
         
         # Check if TAP device has the expected IP assigned
-        actual_tap_ip = self.get_tap_device_ip(tap_device)
-        if actual_tap_ip == 'N/A' or actual_tap_ip != tap_ip:
-            print(f"Error: TAP device '{tap_device}' does not have IP '{tap_ip}' assigned (found: '{actual_tap_ip}')", file=sys.stderr)
+        tap_addresses = sorted(addr.split('/')[0] for addr in state['addresses'].get(tap_device, set()))
+        if tap_ip not in tap_addresses:
+            found = ', '.join(tap_addresses) if tap_addresses else 'N/A'
+            print(f"Error: TAP device '{tap_device}' does not have IP '{tap_ip}' assigned (found: '{found}')", file=sys.stderr)
             return False
         print(f"✓ TAP device '{tap_device}' has IP '{tap_ip}' assigned")
         
         # Check if route exists for VM IP via TAP device
-        try:
-            route_result = self._run_command(["ip", "route", "show", f"{vm_ip}/32"])
-            if not route_result.stdout.strip():
-                print(f"Error: No route found for VM IP '{vm_ip}' via TAP device '{tap_device}'", file=sys.stderr)
-                return False
-            
-            # Verify the route goes through the correct device
-            if tap_device not in route_result.stdout:
-                print(f"Error: Route for VM IP '{vm_ip}' does not go through TAP device '{tap_device}'", file=sys.stderr)
-                print(f"Current route: {route_result.stdout.strip()}", file=sys.stderr)
-                return False
-            
-            print(f"✓ Route for VM IP '{vm_ip}' via TAP device '{tap_device}' exists")
-            
-        except (subprocess.CalledProcessError, Exception) as e:
-            print(f"Error checking route for VM IP '{vm_ip}': {e}", file=sys.stderr)
+        route_devices = state['routes'].get(f"{vm_ip}/32")
+        if not route_devices:
+            print(f"Error: No route found for VM IP '{vm_ip}' via TAP device '{tap_device}'", file=sys.stderr)
             return False
         
+        # Verify the route goes through the correct device
+        if tap_device not in route_devices:
+            print(f"Error: Route for VM IP '{vm_ip}' does not go through TAP device '{tap_device}'", file=sys.stderr)
+            print(f"Current route: {vm_ip} dev {', '.join(sorted(route_devices))}", file=sys.stderr)
+            return False
+        
+        print(f"✓ Route for VM IP '{vm_ip}' via TAP device '{tap_device}' exists")
+        
         print("✓ External network setup validation passed")
-        return True
\ No newline at end of file
+        return True
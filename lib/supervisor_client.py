@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+
+import os
+import socket
+import subprocess
+import sys
+
+from .network_manager import SKIP_SUDO
+
+# Socket of supervisord's [unix_http_server] as installed by the distribution packages
+_SUPERVISOR_SOCKET = "/var/run/supervisor.sock"
+
+# supervisorctl commands that have an XML-RPC equivalent
+_RPC_COMMANDS = ("update", "start", "stop", "status")
+
+
+def _make_proxy(socket_path):
+    """Create an XML-RPC proxy that talks HTTP over supervisord's Unix socket
+
+    xmlrpc.client (and http.client behind it) is only imported here, so commands
+    that never touch supervisord don't pay for it.
+    """
+    import http.client
+    import xmlrpc.client
+
+    class UnixHTTPConnection(http.client.HTTPConnection):
+        def connect(self):
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.connect(socket_path)
+
+    class UnixTransport(xmlrpc.client.Transport):
+        def make_connection(self, host):
+            return UnixHTTPConnection("localhost")
+
+    return xmlrpc.client.ServerProxy("http://localhost/RPC2", transport=UnixTransport())
+
+
+class SupervisorClient:
+    """Controls supervisord over its XML-RPC socket, falling back to supervisorctl"""
+
+    def __init__(self, socket_path=_SUPERVISOR_SOCKET):
+        self.socket_path = socket_path
+        self._proxy = None
+
+    def run(self, command, *args):
+        """Run a supervisorctl command, over XML-RPC when the socket is usable
+
+        Calling supervisord directly saves forking sudo and supervisorctl. Only
+        possible when the socket is accessible, which usually means running as root.
+
+        Args:
+            command: supervisorctl command ("update", "start", "stop" or "status")
+            args: Command arguments (the program name)
+
+        Returns:
+            subprocess.CompletedProcess: Result with returncode, stdout and stderr as
+                                         supervisorctl would have produced them
+        """
+        if command in _RPC_COMMANDS and os.access(self.socket_path, os.R_OK | os.W_OK):
+            try:
+                return self._run_rpc(command, *args)
+            except (OSError, ImportError) as e:
+                # Socket not served or not speaking XML-RPC, let supervisorctl handle it
+                self._proxy = None
+                print(f"Warning: supervisord XML-RPC unavailable ({e}), using supervisorctl", file=sys.stderr)
+
+        cmd = ["supervisorctl", command, *args]
+        if not SKIP_SUDO:
+            cmd.insert(0, "sudo")
+        return subprocess.run(cmd, check=False, capture_output=True, text=True)
+
+    def _run_rpc(self, command, *args):
+        """Run a command through the XML-RPC interface (see run())"""
+        if self._proxy is None:
+            self._proxy = _make_proxy(self.socket_path)
+        supervisor = self._proxy.supervisor
+
+        from xmlrpc.client import Fault, ProtocolError
+        try:
+            if command == "update":
+                output = self._update(supervisor)
+            elif command == "start":
+                supervisor.startProcess(args[0])
+                output = f"{args[0]}: started\n"
+            elif command == "stop":
+                supervisor.stopProcess(args[0])
+                output = f"{args[0]}: stopped\n"
+            else:
+                info = supervisor.getProcessInfo(args[0])
+                output = f"{info['name']:<33} {info['statename']:<9} {info['description']}\n"
+        except Fault as e:
+            return subprocess.CompletedProcess(["supervisorctl", command, *args], 1, "", f"{e.faultString}\n")
+        except ProtocolError as e:
+            raise OSError(f"XML-RPC protocol error: {e.errcode} {e.errmsg}") from e
+        return subprocess.CompletedProcess(["supervisorctl", command, *args], 0, output, "")
+
+    def _update(self, supervisor):
+        """Apply configuration changes like `supervisorctl update`
+
+        Returns:
+            str: Summary of the groups that were added, changed or removed
+        """
+        added, changed, removed = supervisor.reloadConfig()[0]
+        lines = []
+
+        for name in removed:
+            supervisor.stopProcessGroup(name)
+            supervisor.removeProcessGroup(name)
+            lines.append(f"{name}: stopped\n{name}: removed process group")
+
+        for name in changed:
+            supervisor.stopProcessGroup(name)
+            supervisor.removeProcessGroup(name)
+            supervisor.addProcessGroup(name)
+            lines.append(f"{name}: stopped\n{name}: updated process group")
+
+        for name in added:
+            supervisor.addProcessGroup(name)
+            lines.append(f"{name}: added process group")
+
+        return "".join(line + "\n" for line in lines)
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 
-from pathlib import Path
+import os
+from concurrent.futures import ThreadPoolExecutor
 from .firecracker_api import FirecrackerAPI
 from .config_manager import ConfigManager
 from .network_manager import NetworkManager
@@ -14,9 +15,12 @@ class VMDiscovery:
         self.socket_path_prefix = self.config_manager.get_socket_path_prefix()
         self.network_manager = NetworkManager()
     
-    def discover_all_vms(self):
+    def discover_all_vms(self, quiet=False):
         """Discover all VMs (both running and stopped) by scanning cache and socket directories
         
+        Args:
+            quiet: Don't print progress lines while loading cached configurations
+        
         Returns:
             list: List of VM dictionaries containing:
                 - name: VM name
@@ -28,114 +32,179 @@ class VMDiscovery:
                 - tap_ip: TAP device IP address
                 - base_image: Base image used to create VM
                 - networkdriver: Network driver mode (internal/external)
+                - cpus, memory, kernel_name, rootfs_filename, tap_device, mmds_tap:
+                  Resolved from the live or cached configuration (see _vm_details())
         """
         all_vms = []
         
-        # First, get all cached VMs
-        if self.config_manager.cache_dir.exists():
-            for cache_file in self.config_manager.cache_dir.glob("*.json"):
-                vm_name = cache_file.stem  # filename without .json extension
-                
-                # Check if VM is running by looking for socket and testing connection
-                socket_path = str(Path(self.socket_path_prefix) / f"{vm_name}.sock")
-                is_running = False
-                vm_config = None
-                
-                if Path(socket_path).exists():
-                    # Create a temporary API client for this socket
-                    temp_api = FirecrackerAPI(socket_path)
-                    if temp_api.check_socket_in_use():
-                        vm_config = temp_api.get_vm_config()
-                        if vm_config:
-                            is_running = True
-                
-                # Load cached configuration
-                try:
-                    cached_config = self.config_manager.load_vm_config(vm_name)
-                    if not cached_config:  # Skip VMs with corrupted cache files
-                        continue
-                except Exception:
-                    continue
-                
-                # Extract key information for easier access
-                vm_ip = cached_config.get('vm_ip', 'N/A')
-                tap_ip = cached_config.get('tap_ip', 'N/A')
-                base_image = cached_config.get('base_image', 'N/A')
-                networkdriver = cached_config.get('networkdriver', 'internal')
-                
-                # For running VMs, try to get current TAP IP from device
-                if is_running:
-                    tap_device = cached_config.get('tap_device', 'N/A')
-                    if tap_device != 'N/A':
-                        current_tap_ip = self.network_manager.get_tap_device_ip(tap_device)
-                        if current_tap_ip and current_tap_ip != 'N/A':
-                            tap_ip = current_tap_ip
-                    
-                    # Try to get internal IP from MMDS
-                    mmds_data = self._get_mmds_data_for_vm(socket_path)
-                    if mmds_data and 'network_config' in mmds_data:
-                        mmds_vm_ip = mmds_data['network_config'].get('ip', 'N/A')
-                        if mmds_vm_ip != 'N/A':
-                            vm_ip = mmds_vm_ip
+        # First, get all cached VMs (corrupted cache files are skipped)
+        get_socket_path = self.config_manager.get_vm_socket_path
+        cached_vms = [
+            (vm_name, get_socket_path(vm_name), cached_config)
+            for vm_name, cached_config in self.config_manager.load_all_vm_configs(quiet).items()
+        ]
+        
+        if not cached_vms:
+            return all_vms
+        
+        # Query every VM's API up front and concurrently, so building the list below
+        # does no further I/O per VM
+        socket_paths = [socket_path for _, socket_path, _ in cached_vms]
+        with ThreadPoolExecutor(max_workers=min(32, len(socket_paths))) as executor:
+            live_states = list(executor.map(self._probe_vm, socket_paths))
+        
+        # Host device addresses, fetched once for all running VMs
+        device_ips = None
+        if any(vm_config for vm_config, _ in live_states):
+            device_ips = self.network_manager.get_device_ips()
+        
+        for (vm_name, socket_path, cached_config), (vm_config, mmds_data) in zip(cached_vms, live_states):
+            is_running = bool(vm_config)
+            
+            # Extract key information for easier access
+            vm_ip = cached_config.get('vm_ip', 'N/A')
+            tap_ip = cached_config.get('tap_ip', 'N/A')
+            base_image = cached_config.get('base_image', 'N/A')
+            networkdriver = cached_config.get('networkdriver', 'internal')
+            
+            # For running VMs, try to get current TAP IP from device
+            if is_running:
+                tap_device = cached_config.get('tap_device', 'N/A')
+                if tap_device != 'N/A':
+                    current_tap_ip = self.network_manager.get_tap_device_ip(tap_device, device_ips)
+                    if current_tap_ip and current_tap_ip != 'N/A':
+                        tap_ip = current_tap_ip
                 
-                all_vms.append({
-                    'name': vm_name,
-                    'socket_path': socket_path,
-                    'config': vm_config,
-                    'cached_config': cached_config,
-                    'state': 'running' if is_running else 'stopped',
-                    'vm_ip': vm_ip,
-                    'tap_ip': tap_ip,
-                    'base_image': base_image,
-                    'networkdriver': networkdriver
-                })
+                # Try to get internal IP from MMDS
+                if mmds_data and 'network_config' in mmds_data:
+                    mmds_vm_ip = mmds_data['network_config'].get('ip', 'N/A')
+                    if mmds_vm_ip != 'N/A':
+                        vm_ip = mmds_vm_ip
+            
+            all_vms.append({
+                'name': vm_name,
+                'socket_path': socket_path,
+                'config': vm_config,
+                'cached_config': cached_config,
+                'state': 'running' if is_running else 'stopped',
+                'vm_ip': vm_ip,
+                'tap_ip': tap_ip,
+                'base_image': base_image,
+                'networkdriver': networkdriver,
+                **self._vm_details(vm_config if is_running else None, cached_config)
+            })
         
         return all_vms
     
+    @staticmethod
+    def _vm_details(vm_config, cached_config):
+        """Resolve the resources and devices of a VM once, for display and JSON output
+        
+        Args:
+            vm_config: Live API configuration (None for stopped VMs)
+            cached_config: Cached configuration from file
+            
+        Returns:
+            dict: cpus, memory, kernel_name, rootfs_filename, tap_device and mmds_tap
+                  ('N/A' where unknown); kernel and rootfs are file basenames
+        """
+        if not vm_config:
+            # Stopped VMs are described by their cached config
+            kernel_path = cached_config.get('kernel', 'N/A')
+            rootfs_path = cached_config.get('rootfs', 'N/A')
+            return {
+                'cpus': cached_config.get('cpus', 'N/A'),
+                'memory': cached_config.get('memory', 'N/A'),
+                'kernel_name': os.path.basename(kernel_path) if kernel_path != 'N/A' else 'N/A',
+                'rootfs_filename': os.path.basename(rootfs_path) if rootfs_path != 'N/A' else 'N/A',
+                'tap_device': cached_config.get('tap_device', 'N/A'),
+                'mmds_tap': cached_config.get('mmds_tap', 'N/A'),
+            }
+        
+        # Running VMs are described by the live API config
+        machine_config = vm_config.get('machine-config', {})
+        kernel_path = vm_config.get('boot-source', {}).get('kernel_image_path', 'N/A')
+        details = {
+            'cpus': machine_config.get('vcpu_count', 'N/A'),
+            'memory': machine_config.get('mem_size_mib', 'N/A'),
+            'kernel_name': os.path.basename(kernel_path) if kernel_path != 'N/A' else 'N/A',
+            'rootfs_filename': 'N/A',
+            'tap_device': 'N/A',
+            'mmds_tap': 'N/A',
+        }
+        for drive in vm_config.get('drives', []):
+            if drive.get('drive_id') == 'rootfs':
+                rootfs_path = drive.get('path_on_host', 'N/A')
+                if rootfs_path != 'N/A':
+                    details['rootfs_filename'] = os.path.basename(rootfs_path)
+                break
+        for iface in vm_config.get('network-interfaces', []):
+            if iface.get('iface_id') == 'eth0':
+                details['tap_device'] = iface.get('host_dev_name', 'N/A')
+            elif iface.get('iface_id') == 'mmds0':
+                details['mmds_tap'] = iface.get('host_dev_name', 'N/A')
+        return details
+    
     def discover_running_vms(self):
         """Discover running VMs by scanning socket files in socket directory
         
         Returns:
             list: List of running VM dictionaries with name, socket_path, and config
         """
-        socket_dir = Path(self.socket_path_prefix)
         running_vms = []
         
-        if not socket_dir.exists():
+        # Find all .sock files in the directory with a single scandir
+        try:
+            with os.scandir(self.socket_path_prefix) as entries:
+                socket_entries = [entry for entry in entries if entry.name.endswith(".sock") and not entry.name.startswith(".")]
+        except FileNotFoundError:
             return running_vms
+        if not socket_entries:
+            return running_vms
+        socket_paths = [entry.path for entry in socket_entries]
         
-        # Find all .sock files in the directory
-        for socket_file in socket_dir.glob("*.sock"):
-            vm_name = socket_file.stem  # filename without .sock extension
-            socket_path = str(socket_file)
-            
-            # Create a temporary API client for this socket
-            temp_api = FirecrackerAPI(socket_path)
-            
-            # Try to get VM config
-            if temp_api.check_socket_in_use():
-                vm_config = temp_api.get_vm_config()
-                if vm_config:
-                    running_vms.append({
-                        'name': vm_name,
-                        'socket_path': socket_path,
-                        'config': vm_config
-                    })
+        # Probes only wait on socket I/O, so query all sockets concurrently
+        with ThreadPoolExecutor(max_workers=min(32, len(socket_paths))) as executor:
+            vm_configs = list(executor.map(self._probe_socket, socket_paths))
+        
+        for entry, vm_config in zip(socket_entries, vm_configs):
+            if vm_config:
+                running_vms.append({
+                    'name': entry.name[:-5],  # filename without .sock extension
+                    'socket_path': entry.path,
+                    'config': vm_config
+                })
         
         return running_vms
     
-    def _get_mmds_data_for_vm(self, socket_path):
-        """Get MMDS data for a specific VM
+    def _probe_socket(self, socket_path):
+        """Get the live VM configuration from a socket if Firecracker is listening on it
+        
+        Args:
+            socket_path: Path to VM socket file
+            
+        Returns:
+            dict: VM configuration or None if the VM is not running
+        """
+        temp_api = FirecrackerAPI(socket_path)
+        try:
+            return temp_api.get_vm_config()
+        finally:
+            temp_api.close()
+    
+    def _probe_vm(self, socket_path):
+        """Get the live configuration and MMDS data of a VM over one connection
         
         Args:
             socket_path: Path to VM socket file
             
         Returns:
-            dict: MMDS metadata or None if not available
+            tuple: (VM configuration, MMDS data), both None if the VM is not running
         """
+        temp_api = FirecrackerAPI(socket_path)
         try:
-            temp_api = FirecrackerAPI(socket_path)
-            return temp_api.get_mmds_data()
-        except Exception:
-            pass
-        return None
\ No newline at end of file
+            # The /vm/config GET only succeeds if Firecracker is listening, so it
+            # doubles as the liveness check; /mmds is pipelined right behind it
+            return temp_api.get_vm_state()
+        finally:
+            temp_api.close()
@@ -1,15 +1,21 @@
 #!/usr/bin/env python3
 
+import os
 import signal
 import subprocess
 import sys
 import time
-from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 
 from .firecracker_api import FirecrackerAPI
-from .network_manager import NetworkManager
-from .config_manager import ConfigManager
+from .network_manager import NetworkManager, SKIP_SUDO
+from .config_manager import ConfigManager, atomic_write
 from .filesystem_manager import FilesystemManager
+from .supervisor_client import SupervisorClient
+
+# Accepted answers to the destroy confirmation prompt (compared after strip().lower())
+_YES_ANSWERS = frozenset(('yes', 'y'))
+_NO_ANSWERS = frozenset(('no', 'n'))
 
 
 class VMLifecycle:
@@ -36,10 +42,15 @@ class VMLifecycle:
         self.api = FirecrackerAPI(self.socket_path)
         self.network_manager = NetworkManager()
         self.filesystem_manager = FilesystemManager(self.config_manager)
+        self.supervisor = SupervisorClient()
     
-    def _run_command(self, cmd, check=True, capture_output=True, text=True):
+    def _run_command(self, cmd, check=True, capture_output=True, text=True, discard_stdout=False):
         """Helper method to run subprocess commands with consistent error handling"""
+        if SKIP_SUDO and cmd[0] == "sudo":
+            cmd = cmd[1:]
         try:
+            if discard_stdout:
+                return subprocess.run(cmd, check=check, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=text)
             return subprocess.run(cmd, check=check, capture_output=capture_output, text=text)
         except subprocess.CalledProcessError as e:
             if capture_output:
@@ -49,10 +60,33 @@ class VMLifecycle:
             print(f"Unexpected error running command: {' '.join(cmd)}\nError: {e}", file=sys.stderr)
             raise
     
+    def _wait_for_socket(self, timeout=2.0):
+        """Wait until Firecracker accepts connections on the API socket
+        
+        Polls with a short interval that backs off from 5ms to 20ms, so a fast
+        starting Firecracker is picked up almost immediately.
+        
+        Args:
+            timeout: Maximum time to wait in seconds
+            
+        Returns:
+            bool: True if the socket is accepting connections, False on timeout
+        """
+        deadline = time.monotonic() + timeout
+        delay = 0.005
+        while True:
+            if self.api.check_socket_in_use():
+                return True
+            
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(delay)
+            delay = min(delay * 2, 0.02)
+    
     def create_supervisor_config(self, vm_name, socket_path):
         """Create supervisord configuration for VM"""
         # Extract socket directory from socket path
-        socket_dir = Path(socket_path).parent
+        socket_dir = os.path.dirname(socket_path)
         
         config_content = f"""[program:{vm_name}]
 command=/bin/sh -c 'mkdir -p {socket_dir} && exec /usr/sbin/firecracker --id {vm_name} --api-sock {socket_path}'
@@ -61,10 +95,11 @@ stderr_logfile=/var/log/{vm_name}.error.log
 autostart=true
 """
         
-        config_path = Path(f"/etc/supervisor/conf.d/{vm_name}.conf")
+        config_path = f"/etc/supervisor/conf.d/{vm_name}.conf"
         
         try:
-            config_path.write_text(config_content)
+            # supervisord only includes *.conf, so it never reads the temporary file
+            atomic_write(config_path, config_content.encode())
             print(f"✓ Supervisor config created: {config_path}")
             return True
         except Exception as e:
@@ -73,14 +108,14 @@ autostart=true
     
     def remove_supervisor_config(self, vm_name):
         """Remove supervisord configuration for VM"""
-        config_path = Path(f"/etc/supervisor/conf.d/{vm_name}.conf")
+        config_path = f"/etc/supervisor/conf.d/{vm_name}.conf"
         
         try:
-            if config_path.exists():
-                config_path.unlink()
-                print(f"✓ Supervisor config removed: {config_path}")
-            else:
-                print(f"✓ Supervisor config doesn't exist: {config_path}")
+            os.unlink(config_path)
+            print(f"✓ Supervisor config removed: {config_path}")
+            return True
+        except FileNotFoundError:
+            print(f"✓ Supervisor config doesn't exist: {config_path}")
             return True
         except Exception as e:
             print(f"Error removing supervisor config: {e}", file=sys.stderr)
@@ -89,10 +124,13 @@ autostart=true
     def supervisor_reload(self):
         """Reload supervisor configuration"""
         try:
-            self._run_command(["sudo", "supervisorctl", "update"])
+            result = self.supervisor.run("update")
+            if result.returncode != 0:
+                print(f"Error reloading supervisor: {result.stderr.strip() or result.stdout.strip()}", file=sys.stderr)
+                return False
             print("✓ Supervisor configuration reloaded")
             return True
-        except (subprocess.CalledProcessError, Exception) as e:
+        except Exception as e:
             print(f"Error reloading supervisor: {e}", file=sys.stderr)
             return False
     
@@ -116,58 +154,91 @@ autostart=true
         metadata = vm_config.get('metadata')
         mmds_tap = vm_config.get('mmds_tap')
         
-        # Set machine configuration
-        if not self.api.set_machine_config(cpus, memory):
-            print("Failed to set machine configuration", file=sys.stderr)
-            return False
-        print(f"✓ Machine config set: {cpus} vCPUs, {memory} MiB RAM")
-
-        # Set boot source
-        if not self.api.set_boot_source(kernel_path):
-            print("Failed to set boot source", file=sys.stderr)
-            return False
-        print(f"✓ Boot source set: {kernel_path}")
+        # Nothing to publish if the only entry is a network_config without an IP;
+        # treat it as no metadata so neither the MMDS TAP nor mmds0 is set up
+        if metadata and metadata.keys() == {'network_config'} and not (metadata['network_config'] or {}).get('ip'):
+            metadata = None
+        
+        # Queue all pre-boot API requests so they are pipelined over the
+        # kept-alive connection.
+        # Setters still validate their input up front, so errors short-circuit before
+        # anything is sent to Firecracker. The host side TAP setup has no dependency on
+        # machine config, boot source and rootfs, so it runs in a worker thread while
+        # those are sent; only the network interfaces have to wait for it.
+        with ThreadPoolExecutor(max_workers=1) as pool, self.api.batch():
+            configured = []
+            
+            # Set machine configuration
+            if not self.api.set_machine_config(cpus, memory):
+                print("Failed to set machine configuration", file=sys.stderr)
+                return False
+            configured.append(f"✓ Machine config set: {cpus} vCPUs, {memory} MiB RAM")
 
-        # Set rootfs
-        if not self.api.set_rootfs(rootfs_path):
-            print("Failed to set rootfs", file=sys.stderr)
-            return False
-        print(f"✓ Rootfs set: {rootfs_path}")
+            # Set boot source
+            if not self.api.set_boot_source(kernel_path):
+                print("Failed to set boot source", file=sys.stderr)
+                return False
+            configured.append(f"✓ Boot source set: {kernel_path}")
 
-        # Setup TAP device and networking
-        if not self.network_manager.setup_tap_device(tap_device, tap_ip, vm_ip, networkdriver):
-            print("Failed to setup TAP device", file=sys.stderr)
-            return False
+            # Set rootfs
+            if not self.api.set_rootfs(rootfs_path):
+                print("Failed to set rootfs", file=sys.stderr)
+                return False
+            configured.append(f"✓ Rootfs set: {rootfs_path}")
 
-        # Set primary network interface (eth0)
-        if not self.api.set_network_interface("eth0", tap_device):
-            print("Failed to set network interface", file=sys.stderr)
-            return False
-        print(f"✓ Primary network interface set: eth0 -> {tap_device}")
+            # Setup TAP devices and networking (host side) only now that kernel and rootfs
+            # passed validation, so a failed start leaves no devices or routes behind.
+            # The MMDS TAP device is only needed when metadata is provided.
+            mmds_host_tap = mmds_tap if metadata else None
+            network_setup = pool.submit(self.network_manager.setup_vm_network,
+                                        tap_device, tap_ip, vm_ip, mmds_host_tap, networkdriver)
 
-        # Configure MMDS if metadata provided
-        if metadata and mmds_tap:
-            # Setup dedicated MMDS TAP device
-            if not self.network_manager.setup_mmds_tap_device(mmds_tap, networkdriver):
-                print("Failed to setup MMDS TAP device", file=sys.stderr)
+            # Send the first batch while the TAP devices are being set up, then join
+            api_configured = self.api.flush_batch()
+            if not network_setup.result():
+                print("Failed to setup TAP devices", file=sys.stderr)
                 return False
-            
-            # Set dedicated MMDS network interface (mmds0)
-            if not self.api.set_network_interface("mmds0", mmds_tap):
-                print("Failed to set MMDS network interface", file=sys.stderr)
+            if not api_configured:
+                print("Failed to configure Firecracker VM", file=sys.stderr)
+                # Don't leave the TAP devices just set up behind
+                self.network_manager.remove_tap_devices(
+                    [device for device in (tap_device, mmds_host_tap) if device], networkdriver)
                 return False
-            print(f"✓ MMDS network interface set: mmds0 -> {mmds_tap}")
-            
-            # Configure which interface can access MMDS
-            if not self.api.configure_mmds_interface("mmds0"):
-                print("Failed to configure MMDS interface", file=sys.stderr)
+            for message in configured:
+                print(message)
+            configured = []
+
+            # Set primary network interface (eth0)
+            if not self.api.set_network_interface("eth0", tap_device):
+                print("Failed to set network interface", file=sys.stderr)
                 return False
-            print("✓ MMDS interface configured")
-            # Set the metadata
-            if not self.api.set_mmds_metadata(metadata):
-                print("Failed to set MMDS metadata", file=sys.stderr)
+            configured.append(f"✓ Primary network interface set: eth0 -> {tap_device}")
+
+            # Configure MMDS if metadata provided
+            if metadata and mmds_tap:
+                # Set dedicated MMDS network interface (mmds0)
+                if not self.api.set_network_interface("mmds0", mmds_tap):
+                    print("Failed to set MMDS network interface", file=sys.stderr)
+                    return False
+                configured.append(f"✓ MMDS network interface set: mmds0 -> {mmds_tap}")
+                
+                # Configure which interface can access MMDS
+                if not self.api.configure_mmds_interface("mmds0"):
+                    print("Failed to configure MMDS interface", file=sys.stderr)
+                    return False
+                configured.append("✓ MMDS interface configured")
+                # Set the metadata
+                if not self.api.set_mmds_metadata(metadata):
+                    print("Failed to set MMDS metadata", file=sys.stderr)
+                    return False
+                configured.append("✓ MMDS metadata configured")
+
+            # Send the network part; InstanceStart is only issued once all of it succeeded
+            if not self.api.flush_batch():
+                print("Failed to configure Firecracker VM", file=sys.stderr)
                 return False
-            print("✓ MMDS metadata configured")
+            for message in configured:
+                print(message)
 
         # Start the VM
         if not self.api.start_microvm():
@@ -193,30 +264,13 @@ autostart=true
         if not self.supervisor_reload():
             return False
         
-        # Wait for Firecracker to be ready with retries
-        max_retries = 10
-        retry_delay = 1
-        
+        # Wait for Firecracker to be ready
         print("Waiting for Firecracker to start...")
-        for attempt in range(max_retries):
-            time.sleep(retry_delay)
-            
-            # Check if socket file exists
-            socket_file = Path(self.socket_path)
-            if not socket_file.exists():
-                print(f"Attempt {attempt + 1}/{max_retries}: Socket file not yet created")
-                continue
-            
-            # Check if Firecracker is listening
-            if self.api.check_socket_in_use():
-                print(f"✓ Firecracker is ready (attempt {attempt + 1})")
-                break
-            else:
-                print(f"Attempt {attempt + 1}/{max_retries}: Firecracker not yet listening")
-        else:
+        if not self._wait_for_socket(timeout=10):
             print("Error: Firecracker failed to start within timeout period", file=sys.stderr)
             self._debug_firecracker_startup(vm_name)
             return False
+        print("✓ Firecracker is ready")
         
         # Now configure the VM
         return self.configure_and_start(vm_config)
@@ -238,16 +292,14 @@ autostart=true
         # Cleanup function for when process terminates
         def cleanup():
             print("\nCleaning up...")
-            # Remove TAP device
-            self.network_manager.remove_tap_device(tap_device, networkdriver)
-            # Remove MMDS TAP device if it was used
-            if mmds_tap:
-                self.network_manager.remove_tap_device(mmds_tap, networkdriver)
+            # Remove TAP device and, if it was used, the MMDS TAP device
+            self.network_manager.remove_tap_devices([tap_device, mmds_tap] if mmds_tap else [tap_device], networkdriver)
             # Remove socket file
-            socket_file = Path(self.socket_path)
-            if socket_file.exists():
-                socket_file.unlink()
+            try:
+                os.unlink(self.socket_path)
                 print(f"✓ Socket file removed: {self.socket_path}")
+            except FileNotFoundError:
+                pass
         
         # Setup signal handlers for cleanup
         def signal_handler(signum, frame):
@@ -265,8 +317,12 @@ autostart=true
                 "--api-sock", self.socket_path
             ])
             
-            # Wait a moment for Firecracker to start
-            time.sleep(1)
+            # Wait for Firecracker to open its API socket
+            if not self._wait_for_socket():
+                print("Error: Firecracker failed to start within timeout period", file=sys.stderr)
+                firecracker_process.terminate()
+                cleanup()
+                return False
             
             # Configure the VM
             config_success = self.configure_and_start(vm_config)
@@ -353,17 +409,11 @@ autostart=true
         # Step 8: Continue with the original create_vm logic
         vm_name = vm_config['vm_name']
         
-        # Check if socket is in use
-        if self.api.check_socket_in_use():
+        # Check if socket is in use; if the file exists but nothing is listening, delete it
+        if self.api.check_socket_in_use(remove_stale=True):
             print(f"Error: Socket {self.socket_path} is already in use", file=sys.stderr)
             return False
         
-        # If socket file exists but nothing is listening, delete it
-        socket_file = Path(self.socket_path)
-        if socket_file.exists():
-            print(f"Removing stale socket file: {self.socket_path}")
-            socket_file.unlink()
-        
         success = False
         if vm_config.get('foreground', False):
             success = self.create_vm_foreground(vm_config)
@@ -434,45 +484,41 @@ autostart=true
             
             while True:
                 response = input(f"\nAre you sure you want to destroy VM '{vm_name}'? (yes/no): ").strip().lower()
-                if response in ['yes', 'y']:
+                if response in _YES_ANSWERS:
                     break
-                elif response in ['no', 'n']:
+                elif response in _NO_ANSWERS:
                     print("VM destruction cancelled.")
                     return False
                 else:
                     print("Please enter 'yes' or 'no'")
         
         # 4. Remove socket file if it exists
-        socket_file = Path(self.socket_path)
-        if socket_file.exists():
-            socket_file.unlink()
+        try:
+            os.unlink(self.socket_path)
             print(f"✓ Socket file removed: {self.socket_path}")
+        except FileNotFoundError:
+            pass
         
-        # 5. Remove TAP devices using cached config
-        if tap_device:
-            if not self.network_manager.remove_tap_device(tap_device, networkdriver):
-                print(f"Warning: Failed to remove TAP device {tap_device}", file=sys.stderr)
-        else:
+        # 5. Remove TAP devices using cached config (both in one ip invocation)
+        if not tap_device:
             print("✓ No main TAP device found in cache")
-        
-        if mmds_tap:
-            if not self.network_manager.remove_tap_device(mmds_tap, networkdriver):
-                print(f"Warning: Failed to remove MMDS TAP device {mmds_tap}", file=sys.stderr)
-        else:
+        if not mmds_tap:
             print("✓ No MMDS TAP device found in cache")
         
+        tap_devices = [device for device in (tap_device, mmds_tap) if device]
+        if tap_devices and not self.network_manager.remove_tap_devices(tap_devices, networkdriver):
+            print(f"Warning: Failed to remove TAP devices {', '.join(tap_devices)}", file=sys.stderr)
+        
         # 6. Delete rootfs file using cached config
         if rootfs_path:
-            rootfs_file = Path(rootfs_path)
-            if rootfs_file.exists():
-                try:
-                    rootfs_file.unlink()
-                    print(f"✓ Rootfs file deleted: {rootfs_path}")
-                except Exception as e:
-                    print(f"Error: Failed to delete rootfs file {rootfs_path}: {e}", file=sys.stderr)
-                    return False
-            else:
+            try:
+                os.unlink(rootfs_path)
+                print(f"✓ Rootfs file deleted: {rootfs_path}")
+            except FileNotFoundError:
                 print(f"✓ Rootfs file doesn't exist: {rootfs_path}")
+            except Exception as e:
+                print(f"Error: Failed to delete rootfs file {rootfs_path}: {e}", file=sys.stderr)
+                return False
         else:
             print("✓ No rootfs path found in cache")
         
@@ -495,19 +541,21 @@ autostart=true
         """Stop a VM without removing TAP devices"""
         print(f"Stopping VM: {vm_name}...")
         
+        # Don't hold a connection to the Firecracker process that is about to go away
+        self.api.close()
+        
         try:
             # Stop the VM via supervisor
-            result = self._run_command(["sudo", "supervisorctl", "stop", vm_name], check=False)
+            result = self.supervisor.run("stop", vm_name)
             
             if result.returncode == 0:
                 print(f"✓ VM {vm_name} stopped successfully")
                 
                 # Remove socket file to allow clean restart
-                socket_file = Path(self.socket_path)
-                if socket_file.exists():
-                    socket_file.unlink()
+                try:
+                    os.unlink(self.socket_path)
                     print(f"✓ Socket file removed: {self.socket_path}")
-                else:
+                except FileNotFoundError:
                     print(f"✓ Socket file doesn't exist: {self.socket_path}")
                 
                 return True
@@ -549,20 +597,14 @@ autostart=true
             print(f"Error: Missing required fields in cached config: {', '.join(missing_fields)}", file=sys.stderr)
             return False
         
-        # Check if socket is in use
-        if self.api.check_socket_in_use():
+        # Check if socket is in use; if the file exists but nothing is listening, delete it
+        if self.api.check_socket_in_use(remove_stale=True):
             print(f"Error: Socket {self.socket_path} is already in use", file=sys.stderr)
             return False
         
-        # If socket file exists but nothing is listening, delete it
-        socket_file = Path(self.socket_path)
-        if socket_file.exists():
-            print(f"Removing stale socket file: {self.socket_path}")
-            socket_file.unlink()
-        
         # Start Firecracker process via supervisor
         try:
-            result = self._run_command(["sudo", "supervisorctl", "start", vm_name], check=False)
+            result = self.supervisor.run("start", vm_name)
             
             if result.returncode != 0:
                 print(f"Error: Failed to start Firecracker process for VM {vm_name}", file=sys.stderr)
@@ -575,8 +617,10 @@ autostart=true
             print(f"Error starting Firecracker process: {e}", file=sys.stderr)
             return False
         
-        # Wait a moment for Firecracker to start
-        time.sleep(1)
+        # Wait for Firecracker to open its API socket
+        if not self._wait_for_socket():
+            print(f"Error: Firecracker for VM {vm_name} failed to start within timeout period", file=sys.stderr)
+            return False
         
         # Create metadata for MMDS
         metadata = self.config_manager.parse_metadata(None, tap_ip, vm_ip, hostname)
@@ -634,9 +678,20 @@ autostart=true
     
     def _debug_firecracker_startup(self, vm_name):
         """Debug helper for Firecracker startup issues"""
+        log_files = [f"/var/log/{vm_name}.log", f"/var/log/{vm_name}.error.log"]
+        
+        # The status query and log reads are independent, so run them concurrently
+        # and print the results in a fixed order afterwards
+        with ThreadPoolExecutor(max_workers=1 + len(log_files)) as pool:
+            status_future = pool.submit(self.supervisor.run, "status", vm_name)
+            log_futures = [
+                pool.submit(self._run_command, ["sudo", "tail", "-20", log_file], check=False)
+                for log_file in log_files
+            ]
+        
         # Check supervisor status for debugging
         try:
-            result = self._run_command(["sudo", "supervisorctl", "status", vm_name], check=False)
+            result = status_future.result()
             print(f"Supervisor status: {result.stdout.strip()}", file=sys.stderr)
             if result.stderr.strip():
                 print(f"Supervisor stderr: {result.stderr.strip()}", file=sys.stderr)
@@ -644,14 +699,13 @@ autostart=true
             print(f"Could not check supervisor status: {e}", file=sys.stderr)
         
         # Check Firecracker logs for debugging
-        log_files = [f"/var/log/{vm_name}.log", f"/var/log/{vm_name}.error.log"]
-        for log_file in log_files:
+        for log_file, log_future in zip(log_files, log_futures):
             try:
-                result = self._run_command(["sudo", "tail", "-20", log_file], check=False)
+                result = log_future.result()
                 if result.returncode == 0 and result.stdout.strip():
                     print(f"\n--- Last 20 lines of {log_file} ---", file=sys.stderr)
                     print(result.stdout, file=sys.stderr)
                 elif result.returncode != 0:
                     print(f"Could not read {log_file}: {result.stderr.strip()}", file=sys.stderr)
             except Exception as e:
-                print(f"Error reading {log_file}: {e}", file=sys.stderr)
\ No newline at end of file
+                print(f"Error reading {log_file}: {e}", file=sys.stderr)
@@ -298,6 +298,14 @@ class FCMTestLibrary:
         result = subprocess.run(cmd, capture_output=True, text=True)
         return result.stdout
     
+    def list_vms_json(self):
+        """Get list of VMs as parsed JSON"""
+        cmd = [self.fcm_cmd, "list", "--format", "json"]
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise Exception(f"Failed to list VMs as JSON: {result.stderr}")
+        return json.loads(result.stdout)
+    
     # ========== Network and Validation Helpers ==========
     
     def ping_vm(self, vm_ip, count=3, timeout=5):
@@ -816,6 +824,13 @@ class FCMTestLibrary:
         )
         assert result.returncode != 0, "Should fail stopping non-existent VM"
         self.log("✓ Stop non-existent VM error handled")
+        
+        # Test 4: Missing required parameter
+        self.log("Testing missing --name...")
+        result = subprocess.run([self.fcm_cmd, "stop"], capture_output=True, text=True)
+        assert result.returncode == 2, f"Should exit with status 2 on missing --name, got {result.returncode}"
+        assert "Usage:" in result.stderr, "Usage line missing from stderr"
+        self.log("✓ Missing parameter error handled")
     
     def test_list_command(self):
         """Test list command output"""
@@ -841,6 +856,14 @@ class FCMTestLibrary:
         assert "TAP Interface" in vm_list, "TAP Interface column missing"
         self.log("✓ All expected columns present")
         
+        # Verify JSON output carries the same VMs
+        vms_by_name = {vm['name']: vm for vm in self.list_vms_json()}
+        for vm_name, vm_ip, _ in vms:
+            assert vm_name in vms_by_name, f"{vm_name} not in JSON list"
+            assert vms_by_name[vm_name]['state'] == 'running', f"{vm_name} not running in JSON list"
+            assert vms_by_name[vm_name]['vm_ip'] == vm_ip, f"IP {vm_ip} not in JSON list"
+        self.log("✓ JSON output lists all VMs")
+        
         # Clean up
         for vm_name, _, _ in vms:
             self.destroy_vm(vm_name)